@@ -0,0 +1,56 @@
+"""token_scope_mask
+
+Revision ID: 0cd6c90a8051
+Revises: 7adb448d9cad
+Create Date: 2026-10-19 18:10:44.275016
+
+"""
+
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0cd6c90a8051"
+down_revision: Union[str, Sequence[str], None] = "7adb448d9cad"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Bit positions as src.scopes assigned them at this revision, frozen here so
+# later changes to the app cannot alter what this migration writes.
+SCOPE_BITS = {"openid": 1, "profile": 2, "email": 4, "read": 8, "write": 16}
+
+
+def _scope_mask(scope: Optional[str]) -> int:
+    mask = 0
+    for name in (scope or "").split():
+        mask |= SCOPE_BITS.get(name, 0)
+    return mask
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add and backfill the precomputed scope bitmask."""
+    with op.batch_alter_table("tokens") as batch_op:
+        batch_op.add_column(sa.Column("scope_mask", sa.Integer(), server_default="0"))
+
+    tokens_table = sa.table(
+        "tokens",
+        sa.column("scope", sa.String),
+        sa.column("scope_mask", sa.Integer),
+    )
+    bind = op.get_bind()
+    scopes = bind.execute(sa.select(tokens_table.c.scope).distinct()).scalars()
+    for scope in list(scopes):
+        bind.execute(
+            tokens_table.update()
+            .where(tokens_table.c.scope == scope)
+            .values(scope_mask=_scope_mask(scope))
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("tokens") as batch_op:
+        batch_op.drop_column("scope_mask")
@@ -0,0 +1,34 @@
+"""token_listing_indexes
+
+Revision ID: 46ccaaaf57c2
+Revises: 0cd6c90a8051
+Create Date: 2026-10-19 19:02:17.418305
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "46ccaaaf57c2"
+down_revision: Union[str, Sequence[str], None] = "0cd6c90a8051"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Index tokens for keyset listing per user and client."""
+    op.create_index(
+        "ix_tokens_user_id_issued_at", "tokens", ["user_id", "issued_at", "id"]
+    )
+    op.create_index(
+        "ix_tokens_client_id_issued_at", "tokens", ["client_id", "issued_at", "id"]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tokens_client_id_issued_at", table_name="tokens")
+    op.drop_index("ix_tokens_user_id_issued_at", table_name="tokens")
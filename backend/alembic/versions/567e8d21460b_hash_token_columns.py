@@ -0,0 +1,115 @@
+"""hash_token_columns
+
+Revision ID: 567e8d21460b
+Revises: bea5b2e1e7b9
+Create Date: 2026-10-19 17:05:12.481903
+
+"""
+
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "567e8d21460b"
+down_revision: Union[str, Sequence[str], None] = "bea5b2e1e7b9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _digest(value):
+    return hashlib.sha256(value.encode()).digest() if value else None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Replace plaintext tokens and codes with SHA-256 digests."""
+    bind = op.get_bind()
+
+    with op.batch_alter_table("tokens") as batch_op:
+        batch_op.add_column(sa.Column("access_token_hash", sa.LargeBinary(32)))
+        batch_op.add_column(sa.Column("refresh_token_hash", sa.LargeBinary(32)))
+
+    tokens_table = sa.table(
+        "tokens",
+        sa.column("id", sa.Integer),
+        sa.column("access_token", sa.String),
+        sa.column("refresh_token", sa.String),
+        sa.column("access_token_hash", sa.LargeBinary),
+        sa.column("refresh_token_hash", sa.LargeBinary),
+    )
+    rows = bind.execute(
+        sa.select(
+            tokens_table.c.id,
+            tokens_table.c.access_token,
+            tokens_table.c.refresh_token,
+        )
+    ).all()
+    for row in rows:
+        bind.execute(
+            tokens_table.update()
+            .where(tokens_table.c.id == row.id)
+            .values(
+                access_token_hash=_digest(row.access_token),
+                refresh_token_hash=_digest(row.refresh_token),
+            )
+        )
+
+    with op.batch_alter_table("tokens") as batch_op:
+        batch_op.drop_index("ix_tokens_access_token")
+        batch_op.drop_index("ix_tokens_refresh_token")
+        batch_op.drop_column("access_token")
+        batch_op.drop_column("refresh_token")
+        batch_op.create_index(
+            "ix_tokens_access_token_hash", ["access_token_hash"], unique=True
+        )
+        batch_op.create_index(
+            "ix_tokens_refresh_token_hash", ["refresh_token_hash"], unique=True
+        )
+
+    with op.batch_alter_table("authorization_codes") as batch_op:
+        batch_op.add_column(sa.Column("code_hash", sa.LargeBinary(32)))
+
+    codes_table = sa.table(
+        "authorization_codes",
+        sa.column("code", sa.String),
+        sa.column("code_hash", sa.LargeBinary),
+    )
+    for (code,) in bind.execute(sa.select(codes_table.c.code)).all():
+        bind.execute(
+            codes_table.update()
+            .where(codes_table.c.code == code)
+            .values(code_hash=_digest(code))
+        )
+
+    with op.batch_alter_table("authorization_codes", recreate="always") as batch_op:
+        batch_op.drop_index("ix_authorization_codes_code")
+        batch_op.drop_column("code")
+        batch_op.alter_column("code_hash", nullable=False)
+        batch_op.create_primary_key("pk_authorization_codes", ["code_hash"])
+
+
+def downgrade() -> None:
+    """Downgrade schema - Digests cannot be reversed, so issued tokens and codes are dropped."""
+    op.execute("DELETE FROM tokens")
+    op.execute("DELETE FROM authorization_codes")
+
+    with op.batch_alter_table("tokens") as batch_op:
+        batch_op.drop_index("ix_tokens_access_token_hash")
+        batch_op.drop_index("ix_tokens_refresh_token_hash")
+        batch_op.drop_column("access_token_hash")
+        batch_op.drop_column("refresh_token_hash")
+        batch_op.add_column(sa.Column("access_token", sa.String))
+        batch_op.add_column(sa.Column("refresh_token", sa.String))
+        batch_op.create_index("ix_tokens_access_token", ["access_token"], unique=True)
+        batch_op.create_index(
+            "ix_tokens_refresh_token", ["refresh_token"], unique=True
+        )
+
+    with op.batch_alter_table("authorization_codes", recreate="always") as batch_op:
+        batch_op.drop_column("code_hash")
+        batch_op.add_column(sa.Column("code", sa.String, nullable=False))
+        batch_op.create_primary_key("pk_authorization_codes", ["code"])
+        batch_op.create_index("ix_authorization_codes_code", ["code"], unique=False)
@@ -0,0 +1,57 @@
+"""seed_service_client
+
+Revision ID: 608d9bdffe60
+Revises: 567e8d21460b
+Create Date: 2026-10-19 17:31:40.118562
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "608d9bdffe60"
+down_revision: Union[str, Sequence[str], None] = "567e8d21460b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Insert a machine-to-machine client_credentials client."""
+    clients_table = sa.table(
+        "clients",
+        sa.column("client_id", sa.String),
+        sa.column("client_secret", sa.String),
+        sa.column("grant_types", sa.String),
+        sa.column("response_types", sa.String),
+        sa.column("scope", sa.String),
+        sa.column("redirect_uris", sa.String),
+    )
+
+    bind = op.get_bind()
+    exists = bind.execute(
+        sa.text("SELECT 1 FROM clients WHERE client_id = :value"),
+        {"value": "service_client"},
+    ).scalar()
+    if exists is None:
+        op.bulk_insert(
+            clients_table,
+            [
+                {
+                    "client_id": "service_client",
+                    "client_secret": "service_secret",
+                    "grant_types": "client_credentials",
+                    "response_types": "",
+                    "scope": "read",
+                    "redirect_uris": "",
+                }
+            ],
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema - Remove the service client."""
+    op.execute("DELETE FROM clients WHERE client_id = 'service_client'")
@@ -0,0 +1,44 @@
+"""consent_grants
+
+Revision ID: 7adb448d9cad
+Revises: 608d9bdffe60
+Create Date: 2026-10-19 17:52:07.603114
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7adb448d9cad"
+down_revision: Union[str, Sequence[str], None] = "608d9bdffe60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "consent_grants",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("client_id", sa.String(), nullable=True),
+        sa.Column("scope", sa.String(), nullable=True),
+        sa.Column("granted_at", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["client_id"], ["clients.client_id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "client_id", "scope"),
+    )
+    op.create_index(
+        "ix_consent_grants_user_id", "consent_grants", ["user_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_consent_grants_user_id", table_name="consent_grants")
+    op.drop_table("consent_grants")
@@ -0,0 +1,172 @@
+"""Per-call latency and allocation of the storage lookups, Core vs ORM.
+
+    python -m scripts.bench_lookups --rows 100000
+
+The ORM variants below are the Session-based lookups SQLAlchemyStorage used
+before it switched to prebuilt Core statements; they are kept here only as
+the comparison baseline. Allocation is the tracemalloc peak above the
+starting point during one call, averaged.
+"""
+
+from typing import Awaitable, Callable, Dict
+import argparse
+import asyncio
+import os
+import secrets
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+
+async def _measure(call: Callable[[int], Awaitable], iterations: int) -> dict:
+    for i in range(100):
+        await call(i)
+
+    started = time.perf_counter()
+    for i in range(iterations):
+        await call(i)
+    latency = (time.perf_counter() - started) / iterations * 1e6
+
+    peaks = []
+    tracemalloc.start()
+    for i in range(min(iterations, 500)):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await call(i)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return {"us": latency, "kib": statistics.fmean(peaks) / 1024}
+
+
+async def main(args):
+    from sqlalchemy import select
+    from src.auth.security import hash_token
+    from src.clients import client_registry
+    from src.database import Base, SessionLocal, engine
+    from src.models import AuthorizationCode as CodeModel, Client as ClientModel
+    from src.models import Token as TokenModel
+    from src.oauth import storage
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            ClientModel.__table__.insert(),
+            [
+                {"client_id": f"client-{i}", "client_secret": "s", "scope": "read"}
+                for i in range(args.rows // 100)
+            ],
+        )
+        await conn.execute(
+            TokenModel.__table__.insert(),
+            [
+                {
+                    "access_token_hash": hash_token(f"access-{i}"),
+                    "refresh_token_hash": hash_token(f"refresh-{i}"),
+                    "scope": "read",
+                    "scope_mask": 8,
+                    "issued_at": int(time.time()),
+                    "expires_in": 300,
+                    "client_id": "client-0",
+                    "revoked": False,
+                }
+                for i in range(args.rows)
+            ],
+        )
+        await conn.execute(
+            CodeModel.__table__.insert(),
+            [
+                {
+                    "code_hash": hash_token(f"code-{i}"),
+                    "client_id": "client-0",
+                    "redirect_uri": "http://client.test/callback",
+                    "response_type": "code",
+                    "scope": "read",
+                    "auth_time": int(time.time()),
+                    "expires_in": 600,
+                }
+                for i in range(args.rows)
+            ],
+        )
+
+    rows = args.rows
+
+    async def orm_get_token(i):
+        async with SessionLocal() as session:
+            stmt = select(TokenModel).where(
+                TokenModel.access_token_hash == hash_token(f"access-{i % rows}")
+            )
+            token = (await session.execute(stmt)).scalar_one_or_none()
+            return token.to_aioauth_token(f"access-{i % rows}")
+
+    async def orm_get_code(i):
+        async with SessionLocal() as session:
+            stmt = select(CodeModel).where(
+                CodeModel.code_hash == hash_token(f"code-{i % rows}"),
+                CodeModel.client_id == "client-0",
+            )
+            code = (await session.execute(stmt)).scalar_one_or_none()
+            return code.to_aioauth_code(f"code-{i % rows}")
+
+    async def orm_get_client(i):
+        async with SessionLocal() as session:
+            client = await session.get(ClientModel, f"client-{i % (rows // 100)}")
+            return client.to_aioauth_client()
+
+    async def orm_revoke(i):
+        async with SessionLocal() as session:
+            stmt = select(TokenModel).where(
+                TokenModel.refresh_token_hash == hash_token(f"refresh-{i % rows}")
+            )
+            token = (await session.execute(stmt)).scalar_one_or_none()
+            token.revoked = True
+            await session.commit()
+
+    async def core_get_client(i):
+        client_registry.invalidate()  # always take the miss path
+        return await client_registry.get(f"client-{i % (rows // 100)}")
+
+    cases: Dict[str, tuple] = {
+        "get_token": (
+            orm_get_token,
+            lambda i: storage.get_token(None, access_token=f"access-{i % rows}"),
+        ),
+        "get_authorization_code": (
+            orm_get_code,
+            lambda i: storage.get_authorization_code(
+                None, client_id="client-0", code=f"code-{i % rows}"
+            ),
+        ),
+        "get_client (miss)": (orm_get_client, core_get_client),
+        "revoke_token": (
+            orm_revoke,
+            lambda i: storage.revoke_token(None, refresh_token=f"refresh-{i % rows}"),
+        ),
+    }
+
+    print(f"{'':24} {'ORM µs':>8} {'Core µs':>8} {'ORM KiB':>8} {'Core KiB':>9}")
+    for name, (orm, core) in cases.items():
+        before = await _measure(orm, args.iterations)
+        after = await _measure(core, args.iterations)
+        print(
+            f"{name:24} {before['us']:8.0f} {after['us']:8.0f}"
+            f" {before['kib']:8.1f} {after['kib']:9.1f}"
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Core vs ORM storage lookups")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    # src.database reads DATABASE_URL at import time
+    path = os.path.join(
+        tempfile.gettempdir(), f"bench_lookups_{secrets.token_hex(4)}.db"
+    )
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    try:
+        asyncio.run(main(args))
+    finally:
+        os.remove(path)
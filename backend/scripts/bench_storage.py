@@ -0,0 +1,200 @@
+"""Measure SQLAlchemyStorage latency as the tokens table grows.
+
+    python -m scripts.bench_storage --db bench.db \\
+        --sizes 10000,100000,1000000,10000000 --plot scaling.png
+
+For each size the database is grown with `scripts.generate_dataset` (codes
+at a tenth of the token count), then every storage method is timed on
+random existing rows. Results are printed per size and written as JSON;
+the plot needs matplotlib, which is not a project dependency.
+"""
+
+from typing import Awaitable, Callable, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import sqlite3
+import statistics
+import time
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def _time(calls: List[Callable[[], Awaitable]]) -> dict:
+    samples = []
+    for call in calls:
+        started = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": _percentile(samples, 0.50),
+        "p99_us": _percentile(samples, 0.99),
+    }
+
+
+async def bench_size(path: str, size: int, iterations: int, seed: int) -> dict:
+    from scripts.generate_dataset import (
+        access_token,
+        authorization_code,
+        generate,
+        refresh_token,
+    )
+    from src.auth.security import hash_token
+    from src.database import engine
+    from src.oauth import storage
+
+    # The generator takes an exclusive lock, so pooled connections must go
+    await engine.dispose()
+    generate(path, tokens=size, codes=size // 10, seed=seed)
+
+    rng = random.Random(seed)
+    token_rows = rng.sample(range(size), min(iterations, size))
+    refresh_rows = [i for i in token_rows if refresh_token(i)]
+    code_rows = rng.sample(range(size // 10), min(iterations, size // 10))
+    with sqlite3.connect(path) as conn:
+        code_clients = {
+            i: conn.execute(
+                "SELECT client_id FROM authorization_codes WHERE code_hash = ?",
+                (hash_token(authorization_code(i)),),
+            ).fetchone()[0]
+            for i in code_rows
+        }
+    new_tokens = [secrets.token_urlsafe(32) for _ in range(iterations)]
+    new_codes = [secrets.token_urlsafe(32) for _ in range(iterations)]
+
+    results: Dict[str, dict] = {}
+    results["get_token(access)"] = await _time(
+        [
+            lambda i=i: storage.get_token(request=None, access_token=access_token(i))
+            for i in token_rows
+        ]
+    )
+    results["get_token(refresh)"] = await _time(
+        [
+            lambda i=i: storage.get_token(request=None, refresh_token=refresh_token(i))
+            for i in refresh_rows
+        ]
+    )
+    results["get_authorization_code"] = await _time(
+        [
+            lambda i=i: storage.get_authorization_code(
+                None, client_id=code_clients[i], code=authorization_code(i)
+            )
+            for i in code_rows
+        ]
+    )
+    results["create_token"] = await _time(
+        [
+            lambda token=token: storage.create_token(
+                None,
+                client_id="bench-client-0",
+                scope="read",
+                access_token=token,
+            )
+            for token in new_tokens
+        ]
+    )
+    # Revoke the tokens just created: seeded rows stay unrevoked for the
+    # lookups at the next, larger size
+    results["revoke_token"] = await _time(
+        [
+            lambda token=token: storage.revoke_token(None, access_token=token)
+            for token in new_tokens
+        ]
+    )
+    results["create_authorization_code"] = await _time(
+        [
+            lambda code=code: storage.create_authorization_code(
+                request=None,
+                client_id="bench-client-0",
+                scope="read",
+                response_type="code",
+                redirect_uri="http://client-0.test/callback",
+                code=code,
+            )
+            for code in new_codes
+        ]
+    )
+    results["consume_authorization_code"] = await _time(
+        [
+            lambda code=code: storage.consume_authorization_code(
+                None, client_id="bench-client-0", code=code
+            )
+            for code in new_codes
+        ]
+    )
+
+    # Undo the writes so the next, larger size appends from a clean count
+    await engine.dispose()
+    with sqlite3.connect(path) as conn:
+        conn.execute("DELETE FROM tokens WHERE id > ?", (size,))
+    return results
+
+
+def plot(results: Dict[int, Dict[str, dict]], path: str):
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed, skipping the plot")
+        return
+
+    sizes = sorted(results)
+    fig, ax = plt.subplots(figsize=(9, 6))
+    for method in results[sizes[0]]:
+        ax.plot(
+            sizes,
+            [results[size][method]["p50_us"] for size in sizes],
+            marker="o",
+            label=method,
+        )
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    ax.set_xlabel("rows in tokens")
+    ax.set_ylabel("p50 latency (µs)")
+    ax.set_title("SQLAlchemyStorage latency vs dataset size")
+    ax.legend()
+    ax.grid(True, which="both", alpha=0.3)
+    fig.savefig(path, dpi=120, bbox_inches="tight")
+    print(f"plot written to {path}")
+
+
+async def main(args):
+    results = {}
+    for size in sorted(int(s) for s in args.sizes.split(",")):
+        results[size] = await bench_size(args.db, size, args.iterations, args.seed)
+        print(f"\n{size:,} tokens")
+        for method, stats in results[size].items():
+            print(
+                f"  {method:28} p50 {stats['p50_us']:8.0f} µs"
+                f"  p99 {stats['p99_us']:8.0f} µs"
+            )
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    if args.plot:
+        plot(results, args.plot)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Storage latency vs dataset size")
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_storage.json")
+    parser.add_argument("--plot", help="write the scaling curve to this PNG")
+    args = parser.parse_args()
+
+    # src.database reads DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{args.db}"
+    asyncio.run(main(args))
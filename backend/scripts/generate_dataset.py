@@ -0,0 +1,242 @@
+"""Bulk-load a synthetic dataset into a SQLite database for benchmarking.
+
+    python -m scripts.generate_dataset --db bench.db --tokens 10000000
+
+Counts are totals: running again with larger numbers appends the missing
+rows, so one file can be grown step by step. Plaintext secrets are derived
+from the row number (see `access_token` and friends), which lets the
+benchmark look up rows that are known to exist.
+
+The schema comes from the ORM models; run `alembic stamp head` against the
+file if it should also be migrated later.
+"""
+
+from sqlalchemy import create_engine
+from src.auth.security import get_password_hash, hash_token
+from src.database import Base
+from src.models import Token  # noqa: F401 -- registers every table on Base
+from src.scopes import scope_registry
+from typing import Callable, Iterator, Optional
+import argparse
+import itertools
+import random
+import sqlite3
+import time
+
+BATCH_SIZE = 50_000
+TOKEN_AGE_MEAN = 30 * 86400  # never pruned: most rows are long expired
+TOKEN_AGE_MAX = 365 * 86400
+CODE_AGE_MEAN = 86400
+USER_SCOPES = ["openid profile read", "openid read", "read", "read write"]
+SERVICE_SCOPES = ["read", "read write"]
+
+
+def access_token(i: int) -> str:
+    return f"bench-access-{i}"
+
+
+def refresh_token(i: int) -> Optional[str]:
+    # Three in five tokens come from authorization_code and carry a refresh
+    # token and a user; the rest are client_credentials tokens
+    return f"bench-refresh-{i}" if i % 5 < 3 else None
+
+
+def authorization_code(i: int) -> str:
+    return f"bench-code-{i}"
+
+
+def client_id(i: int) -> str:
+    return f"bench-client-{i}"
+
+
+def _popular_client(rng: random.Random, clients: int) -> int:
+    # Pareto-skewed, so a handful of clients own most tokens
+    return min(int(rng.paretovariate(1.2)) - 1, clients - 1)
+
+
+def _users(start: int, end: int, password_hash: str) -> Iterator[tuple]:
+    for i in range(start, end):
+        yield (i + 1, f"bench-user-{i}", password_hash)
+
+
+def _clients(start: int, end: int) -> Iterator[tuple]:
+    for i in range(start, end):
+        yield (
+            client_id(i),
+            f"bench-secret-{i}",
+            "authorization_code,refresh_token,client_credentials",
+            "code",
+            "openid profile read write",
+            f"http://client-{i}.test/callback",
+        )
+
+
+def _tokens(
+    start: int, end: int, users: int, clients: int, now: int, seed: int
+) -> Iterator[tuple]:
+    rng = random.Random(f"tokens:{seed}:{start}")
+    for i in range(start, end):
+        refresh = refresh_token(i)
+        scope = rng.choice(USER_SCOPES if refresh else SERVICE_SCOPES)
+        age = min(rng.expovariate(1 / TOKEN_AGE_MEAN), TOKEN_AGE_MAX)
+        yield (
+            i + 1,
+            hash_token(access_token(i)),
+            hash_token(refresh) if refresh else None,
+            scope,
+            scope_registry.mask(scope),
+            now - int(age),
+            300 if rng.random() < 0.8 else 3600,
+            client_id(_popular_client(rng, clients)),
+            rng.randint(1, users) if refresh else None,
+            rng.random() < 0.03,
+        )
+
+
+def _codes(
+    start: int, end: int, users: int, clients: int, now: int, seed: int
+) -> Iterator[tuple]:
+    # Redeemed codes are deleted, so what is left is mostly expired leftovers
+    rng = random.Random(f"codes:{seed}:{start}")
+    for i in range(start, end):
+        cid = _popular_client(rng, clients)
+        yield (
+            hash_token(authorization_code(i)),
+            client_id(cid),
+            rng.randint(1, users),
+            f"http://client-{cid}.test/callback",
+            "code",
+            rng.choice(USER_SCOPES),
+            now - int(rng.expovariate(1 / CODE_AGE_MEAN)),
+            600,
+        )
+
+
+INSERTS = {
+    "users": "INSERT INTO users (id, username, password_hash) VALUES (?, ?, ?)",
+    "clients": (
+        "INSERT INTO clients (client_id, client_secret, grant_types,"
+        " response_types, scope, redirect_uris) VALUES (?, ?, ?, ?, ?, ?)"
+    ),
+    "tokens": (
+        "INSERT INTO tokens (id, access_token_hash, refresh_token_hash, scope,"
+        " scope_mask, issued_at, expires_in, client_id, user_id, revoked)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "authorization_codes": (
+        "INSERT INTO authorization_codes (code_hash, client_id, user_id,"
+        " redirect_uri, response_type, scope, auth_time, expires_in)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+}
+
+
+def _fill(
+    conn: sqlite3.Connection,
+    table: str,
+    target: int,
+    rows: Callable[[int, int], Iterator[tuple]],
+) -> int:
+    existing = conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+    if target <= existing:
+        return 0
+
+    # Building an index once at the end beats updating it per row, but only
+    # when the load is at least as large as what is already there
+    indexes = []
+    if target - existing >= existing:
+        indexes = conn.execute(
+            "SELECT name, sql FROM sqlite_master"
+            " WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,),
+        ).fetchall()
+        for name, _ in indexes:
+            conn.execute(f"DROP INDEX {name}")
+
+    source = rows(existing, target)
+    while batch := list(itertools.islice(source, BATCH_SIZE)):
+        conn.executemany(INSERTS[table], batch)
+    for _, sql in indexes:
+        conn.execute(sql)
+    conn.commit()
+    return target - existing
+
+
+def generate(
+    path: str,
+    users: int = 1000,
+    clients: int = 100,
+    tokens: int = 100_000,
+    codes: int = 10_000,
+    seed: int = 0,
+    now: Optional[int] = None,
+) -> dict:
+    """Grows the database at `path` to the given row counts and returns how
+    many rows were added per table."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    now = now or int(time.time())
+    # One shared hash: a real argon2 hash per row would dominate load time
+    password_hash = get_password_hash("bench")
+
+    conn = sqlite3.connect(path)
+    try:
+        for pragma in (
+            "journal_mode = OFF",
+            "synchronous = OFF",
+            "locking_mode = EXCLUSIVE",
+            "temp_store = MEMORY",
+            "cache_size = -262144",
+        ):
+            conn.execute(f"PRAGMA {pragma}")
+
+        added = {
+            "users": _fill(
+                conn, "users", users, lambda a, b: _users(a, b, password_hash)
+            ),
+            "clients": _fill(conn, "clients", clients, _clients),
+            "tokens": _fill(
+                conn,
+                "tokens",
+                tokens,
+                lambda a, b: _tokens(a, b, users, clients, now, seed),
+            ),
+            "authorization_codes": _fill(
+                conn,
+                "authorization_codes",
+                codes,
+                lambda a, b: _codes(a, b, users, clients, now, seed),
+            ),
+        }
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset")
+    parser.add_argument("--db", default="bench.db", help="SQLite file to grow")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--tokens", type=int, default=100_000)
+    parser.add_argument("--codes", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    added = generate(
+        args.db,
+        users=args.users,
+        clients=args.clients,
+        tokens=args.tokens,
+        codes=args.codes,
+        seed=args.seed,
+    )
+    elapsed = time.perf_counter() - started
+    for table, count in added.items():
+        print(f"{table}: +{count}")
+    print(f"done in {elapsed:.1f}s")
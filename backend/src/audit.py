@@ -0,0 +1,163 @@
+"""Append-only audit trail of the token lifecycle.
+
+Storage calls `audit_log.emit(...)`, which only appends to an in-memory ring
+buffer. A background task drains the buffer in batches to rotating NDJSON
+segment files, with one fsync per batch, so no request waits on disk I/O.
+
+Read segments back with:
+
+    python -m src.audit --dir ./audit --event token_issued
+"""
+
+from collections import deque
+from typing import Iterator, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import logging
+import mmap
+import os
+import time
+
+AUDIT_DIR = os.environ.get("AUDIT_DIR", "./audit")
+BUFFER_CAPACITY = 100_000
+FLUSH_INTERVAL = 0.5
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+SEGMENT_SUFFIX = ".ndjson"
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLog:
+    def __init__(
+        self,
+        directory: str = AUDIT_DIR,
+        capacity: int = BUFFER_CAPACITY,
+        flush_interval: float = FLUSH_INTERVAL,
+        segment_max_bytes: int = SEGMENT_MAX_BYTES,
+    ):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.segment_max_bytes = segment_max_bytes
+        # Ring buffer: when the writer falls behind, the oldest events are dropped
+        self._buffer: deque = deque(maxlen=capacity)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        # One batch at a time: _write appends to and rotates a shared segment
+        self._write_lock = asyncio.Lock()
+        self._segment_seq = 0
+        self._segment_size = 0
+        self.dropped = 0
+
+    def emit(self, event: str, **fields):
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append((time.time(), event, fields))
+
+    async def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        segments = list_segments(self.directory)
+        if segments:
+            last = segments[-1]
+            self._segment_seq = int(os.path.basename(last)[8 : -len(SEGMENT_SUFFIX)])
+            self._segment_size = os.path.getsize(last)
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            # Let the loop finish its in-flight write; cancelling it would
+            # leave that thread running alongside the final flush
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Audit flush failed: {e}")
+
+    async def flush(self):
+        async with self._write_lock:
+            batch = []
+            while self._buffer:
+                batch.append(self._buffer.popleft())
+            if batch:
+                await asyncio.to_thread(self._write, batch)
+
+    def _segment_path(self) -> str:
+        return os.path.join(
+            self.directory, f"segment-{self._segment_seq:08d}{SEGMENT_SUFFIX}"
+        )
+
+    def _write(self, batch: List[Tuple[float, str, dict]]):
+        data = b"".join(
+            json.dumps(
+                {"ts": ts, "event": event, **fields}, separators=(",", ":")
+            ).encode()
+            + b"\n"
+            for ts, event, fields in batch
+        )
+        if (
+            self._segment_size
+            and self._segment_size + len(data) > self.segment_max_bytes
+        ):
+            self._segment_seq += 1
+            self._segment_size = 0
+        with open(self._segment_path(), "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._segment_size += len(data)
+
+
+def list_segments(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith("segment-") and name.endswith(SEGMENT_SUFFIX)
+    )
+
+
+def read_events(
+    directory: str, event: Optional[str] = None, since: float = 0
+) -> Iterator[dict]:
+    needle = f'"event":"{event}"'.encode() if event else None
+    for path in list_segments(directory):
+        if os.path.getsize(path) == 0:
+            continue
+        with (
+            open(path, "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m,
+        ):
+            for line in iter(m.readline, b""):
+                # Cheap byte filter before paying for json.loads
+                if needle and needle not in line:
+                    continue
+                record = json.loads(line)
+                if record["ts"] >= since:
+                    yield record
+
+
+# Global Instance
+audit_log = AuditLog()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan audit log segments")
+    parser.add_argument("--dir", default=AUDIT_DIR)
+    parser.add_argument("--event", help="only events of this type")
+    parser.add_argument("--since", type=float, default=0, help="unix timestamp")
+    args = parser.parse_args()
+
+    for record in read_events(args.dir, event=args.event, since=args.since):
+        print(json.dumps(record))
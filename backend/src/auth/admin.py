@@ -0,0 +1,43 @@
+from fastapi import HTTPException, Request
+from typing import Optional
+import hashlib
+import hmac
+import os
+import time
+
+ADMIN_SECRET = os.environ.get("ADMIN_SECRET")
+ADMIN_TOKEN_MAX_AGE = 300
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def _signature(secret: str, timestamp: str) -> str:
+    return hmac.new(secret.encode(), timestamp.encode(), hashlib.sha256).hexdigest()
+
+
+def sign_admin_token(
+    secret: Optional[str] = None, timestamp: Optional[int] = None
+) -> str:
+    """Short-lived `<timestamp>.<hmac>` token for the admin header."""
+    secret = secret or ADMIN_SECRET
+    if not secret:
+        raise RuntimeError("ADMIN_SECRET is not configured")
+    timestamp = str(timestamp or int(time.time()))
+    return f"{timestamp}.{_signature(secret, timestamp)}"
+
+
+def verify_admin_token(token: Optional[str], secret: Optional[str] = None) -> bool:
+    secret = secret or ADMIN_SECRET
+    if not secret or not token:
+        return False
+    timestamp, _, signature = token.partition(".")
+    if (
+        not timestamp.isdigit()
+        or abs(time.time() - int(timestamp)) > ADMIN_TOKEN_MAX_AGE
+    ):
+        return False
+    return hmac.compare_digest(signature, _signature(secret, timestamp))
+
+
+async def require_admin(request: Request):
+    if not verify_admin_token(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -0,0 +1,42 @@
+from fastapi import HTTPException, Request
+from src.models import ScopedToken
+from src.oauth import server
+from src.scopes import scope_registry
+
+
+def require_scopes(*names: str):
+    """FastAPI dependency resolving the bearer token and checking it was
+    granted every scope in `names`."""
+    required = scope_registry.require(*names)
+    scope_param = f'scope="{" ".join(names)}"'
+
+    async def dependency(request: Request) -> ScopedToken:
+        auth_header = request.headers.get("Authorization")
+        if not auth_header:
+            raise HTTPException(
+                status_code=401,
+                detail="Missing Authorization header",
+                headers={"WWW-Authenticate": f"Bearer {scope_param}"},
+            )
+
+        scheme, _, param = auth_header.partition(" ")
+        if scheme.lower() != "bearer":
+            raise HTTPException(status_code=401, detail="Invalid token scheme")
+
+        token = await server.storage.get_token(request=None, access_token=param)
+
+        if not token or token.revoked or token.is_expired:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+        if token.scope_mask & required != required:
+            raise HTTPException(
+                status_code=403,
+                detail="Insufficient scope",
+                headers={
+                    "WWW-Authenticate": f'Bearer error="insufficient_scope", {scope_param}'
+                },
+            )
+
+        return token
+
+    return dependency
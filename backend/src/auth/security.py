@@ -1,4 +1,6 @@
+import hashlib
 from passlib.context import CryptContext
+from src.profiling import staged
 
 pwd_context = CryptContext(
     schemes=["argon2"],
@@ -9,9 +11,14 @@ pwd_context = CryptContext(
 )
 
 
+@staged("argon2")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+def hash_token(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
@@ -0,0 +1,72 @@
+from aioauth.models import Client
+from sqlalchemy import bindparam, event, select
+from src.database import engine
+from src.models import Client as ClientModel, aioauth_client
+from src.singleflight import SingleFlight
+from typing import Dict, Optional, Tuple
+import time
+
+# Upper bound on how long a change made outside this process (another
+# worker, a migration, raw SQL) takes to be seen
+CLIENT_CACHE_TTL = 60
+
+_clients = ClientModel.__table__
+_SELECT_CLIENTS = select(_clients)
+_SELECT_CLIENT = select(_clients).where(_clients.c.client_id == bindparam("client_id"))
+
+
+class ClientRegistry:
+    """In-memory view of the `clients` table.
+
+    Clients change rarely and are read on every `/authorize` and `/token`
+    call, so they are served from memory. Entries are dropped when the row
+    is updated or deleted through the ORM, and re-read after `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float = CLIENT_CACHE_TTL):
+        self.ttl = ttl
+        self._clients: Dict[str, Tuple[Client, float]] = {}
+        # A burst of requests for an uncached client shares one SELECT
+        self.misses = SingleFlight("get_client")
+
+    async def load(self) -> int:
+        async with engine.connect() as conn:
+            result = await conn.execute(_SELECT_CLIENTS)
+            expires_at = time.monotonic() + self.ttl
+            self._clients = {
+                row.client_id: (aioauth_client(row), expires_at) for row in result
+            }
+        return len(self._clients)
+
+    async def get(self, client_id: str) -> Optional[Client]:
+        cached = self._clients.get(client_id)
+        if cached and time.monotonic() < cached[1]:
+            return cached[0]
+        return await self.misses.do(client_id, lambda: self._fetch(client_id))
+
+    async def _fetch(self, client_id: str) -> Optional[Client]:
+        async with engine.connect() as conn:
+            result = await conn.execute(_SELECT_CLIENT, {"client_id": client_id})
+            row = result.first()
+        if row is None:
+            self._clients.pop(client_id, None)
+            return None
+        client = aioauth_client(row)
+        self._clients[client_id] = (client, time.monotonic() + self.ttl)
+        return client
+
+    def invalidate(self, client_id: Optional[str] = None):
+        if client_id is None:
+            self._clients.clear()
+        else:
+            self._clients.pop(client_id, None)
+
+
+# Global Instance
+client_registry = ClientRegistry()
+
+
+@event.listens_for(ClientModel, "after_update")
+@event.listens_for(ClientModel, "after_delete")
+def _invalidate_client(mapper, connection, target: ClientModel):
+    client_registry.invalidate(target.client_id)
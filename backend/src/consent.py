@@ -0,0 +1,93 @@
+from aioauth.utils import enforce_list
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from src.database import SessionLocal
+from src.models import ConsentGrant
+from typing import Dict, FrozenSet, List, Tuple
+import time
+
+
+def normalize_scope(scope: str | None) -> str:
+    return " ".join(sorted(set(enforce_list(scope or ""))))
+
+
+class ConsentStore:
+    """Remembered user approvals, cached per (user_id, client_id).
+
+    A request is covered when every requested scope is among the scopes the
+    user has already approved for that client.
+    """
+
+    def __init__(self):
+        self._granted: Dict[Tuple[int, str], FrozenSet[str]] = {}
+
+    async def granted_scopes(self, user_id: int, client_id: str) -> FrozenSet[str]:
+        key = (user_id, client_id)
+        if key not in self._granted:
+            async with SessionLocal() as session:
+                result = await session.execute(
+                    select(ConsentGrant.scope).where(
+                        ConsentGrant.user_id == user_id,
+                        ConsentGrant.client_id == client_id,
+                    )
+                )
+                self._granted[key] = frozenset(
+                    name for scope in result.scalars() for name in scope.split()
+                )
+        return self._granted[key]
+
+    async def is_covered(self, user_id: int, client_id: str, scope: str | None) -> bool:
+        granted = await self.granted_scopes(user_id, client_id)
+        return bool(granted) and set(enforce_list(scope or "")) <= granted
+
+    async def grant(self, user_id: int, client_id: str, scope: str | None):
+        scope = normalize_scope(scope)
+        if not scope or await self.is_covered(user_id, client_id, scope):
+            return
+        async with SessionLocal() as session:
+            session.add(
+                ConsentGrant(
+                    user_id=user_id,
+                    client_id=client_id,
+                    scope=scope,
+                    granted_at=int(time.time()),
+                )
+            )
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Same grant recorded concurrently
+                await session.rollback()
+        self._granted.pop((user_id, client_id), None)
+
+    async def revoke(self, user_id: int, client_id: str) -> int:
+        async with SessionLocal() as session:
+            result = await session.execute(
+                delete(ConsentGrant).where(
+                    ConsentGrant.user_id == user_id,
+                    ConsentGrant.client_id == client_id,
+                )
+            )
+            await session.commit()
+        self._granted.pop((user_id, client_id), None)
+        return result.rowcount
+
+    async def list_grants(self, user_id: int) -> List[dict]:
+        async with SessionLocal() as session:
+            result = await session.execute(
+                select(ConsentGrant)
+                .where(ConsentGrant.user_id == user_id)
+                .order_by(ConsentGrant.granted_at)
+            )
+            return [
+                {
+                    "client_id": grant.client_id,
+                    "scope": grant.scope,
+                    "granted_at": grant.granted_at,
+                }
+                for grant in result.scalars()
+            ]
+
+
+# Global Instance
+consent_store = ConsentStore()
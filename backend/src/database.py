@@ -1,7 +1,8 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+import os
 
-DATABASE_URL = "sqlite+aiosqlite:///./oauth2.db"
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite+aiosqlite:///./oauth2.db")
 
 engine = create_async_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = async_sessionmaker(
@@ -0,0 +1,133 @@
+from dataclasses import dataclass, field
+from src.auth.security import hash_token
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import os
+import secrets
+import time
+
+DEVICE_CODE_GRANT = "urn:ietf:params:oauth:grant-type:device_code"
+DEVICE_CODE_EXPIRES_IN = 600
+POLL_INTERVAL = 5
+# How long a /token poll is held open waiting for the user's decision
+LONG_POLL_TIMEOUT = 20
+# The frontend page where users enter the code shown on their device
+VERIFICATION_URI = os.environ.get(
+    "DEVICE_VERIFICATION_URI", "http://localhost:5173/device"
+)
+
+# RFC 8628 section 6.1: consonants only, so codes cannot spell words
+USER_CODE_ALPHABET = "BCDFGHJKLMNPQRSTVWXZ"
+
+
+@dataclass(slots=True)
+class DeviceAuthorization:
+    user_code: str
+    client_id: str
+    scope: str
+    expires_at: float
+    status: str = "pending"  # pending | approved | denied
+    user_id: Optional[int] = None
+    decided: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def is_expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+
+class DeviceAuthorizationRegistry:
+    """Pending device authorizations (RFC 8628), kept in process memory.
+
+    Polling clients wait on the entry's event instead of re-querying storage,
+    so an idle device costs one dict entry and one parked coroutine.
+    """
+
+    def __init__(self, expires_in: int = DEVICE_CODE_EXPIRES_IN):
+        self.expires_in = expires_in
+        self._by_device_code: Dict[bytes, DeviceAuthorization] = {}
+        self._by_user_code: Dict[str, bytes] = {}
+        self._expiry: List[Tuple[float, bytes]] = []
+
+    def __len__(self) -> int:
+        return len(self._by_device_code)
+
+    @staticmethod
+    def _new_user_code() -> str:
+        code = "".join(secrets.choice(USER_CODE_ALPHABET) for _ in range(8))
+        return f"{code[:4]}-{code[4:]}"
+
+    @staticmethod
+    def normalize_user_code(user_code: str) -> str:
+        code = "".join(c for c in user_code.upper() if c in USER_CODE_ALPHABET)
+        return f"{code[:4]}-{code[4:]}"
+
+    def _purge_expired(self):
+        now = time.time()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, key = heapq.heappop(self._expiry)
+            authorization = self._by_device_code.pop(key, None)
+            if authorization:
+                self._by_user_code.pop(authorization.user_code, None)
+                authorization.decided.set()
+
+    def start(self, client_id: str, scope: str) -> Tuple[str, DeviceAuthorization]:
+        self._purge_expired()
+        device_code = secrets.token_urlsafe(32)
+        user_code = self._new_user_code()
+        while user_code in self._by_user_code:
+            user_code = self._new_user_code()
+
+        key = hash_token(device_code)
+        authorization = DeviceAuthorization(
+            user_code=user_code,
+            client_id=client_id,
+            scope=scope,
+            expires_at=time.time() + self.expires_in,
+        )
+        self._by_device_code[key] = authorization
+        self._by_user_code[user_code] = key
+        heapq.heappush(self._expiry, (authorization.expires_at, key))
+        return device_code, authorization
+
+    def get_by_user_code(self, user_code: str) -> Optional[DeviceAuthorization]:
+        self._purge_expired()
+        key = self._by_user_code.get(self.normalize_user_code(user_code))
+        return self._by_device_code.get(key) if key else None
+
+    def decide(self, user_code: str, user_id: int, approved: bool) -> bool:
+        authorization = self.get_by_user_code(user_code)
+        if authorization is None or authorization.status != "pending":
+            return False
+        authorization.status = "approved" if approved else "denied"
+        authorization.user_id = user_id
+        authorization.decided.set()
+        return True
+
+    async def wait(
+        self, device_code: str, client_id: str, timeout: float
+    ) -> Optional[DeviceAuthorization]:
+        """Waits up to `timeout` seconds for a decision. Returns None for an
+        unknown or foreign device code."""
+        authorization = self._by_device_code.get(hash_token(device_code))
+        if authorization is None or authorization.client_id != client_id:
+            return None
+
+        if authorization.status == "pending":
+            remaining = min(timeout, authorization.expires_at - time.time())
+            try:
+                await asyncio.wait_for(authorization.decided.wait(), remaining)
+            except TimeoutError:
+                pass
+
+        return authorization
+
+    def consume(self, device_code: str) -> Optional[DeviceAuthorization]:
+        authorization = self._by_device_code.pop(hash_token(device_code), None)
+        if authorization:
+            self._by_user_code.pop(authorization.user_code, None)
+        return authorization
+
+
+# Global Instance
+device_authorizations = DeviceAuthorizationRegistry()
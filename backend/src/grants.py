@@ -0,0 +1,280 @@
+from aioauth.errors import (
+    AccessDeniedError,
+    InvalidGrantError,
+    InvalidRedirectURIError,
+    InvalidRequestError,
+    MismatchingStateError,
+    OAuth2Error,
+)
+from aioauth.grant_type import (
+    AuthorizationCodeGrantType,
+    ClientCredentialsGrantType,
+    GrantTypeBase,
+    RefreshTokenGrantType,
+)
+from aioauth.models import Client, Token
+from aioauth.oidc.core.responses import TokenResponse as IdTokenResponse
+from aioauth.requests import Request
+from aioauth.responses import TokenResponse
+from dataclasses import asdict, dataclass
+from src.device import LONG_POLL_TIMEOUT, device_authorizations
+from aioauth.utils import enforce_list, enforce_str, generate_token
+from typing import Dict, Optional, Tuple
+import time
+
+# Repeated client_credentials requests for the same scope within this many
+# seconds get the already issued token back instead of a new row.
+CLIENT_CREDENTIALS_REUSE_WINDOW = 60
+
+
+class AtomicAuthorizationCodeGrantType(AuthorizationCodeGrantType):
+    """Authorization code grant that redeems the code through
+    `storage.consume_authorization_code` instead of a separate get and delete,
+    so concurrent exchanges of the same code cannot both succeed."""
+
+    async def validate_request(self, request: Request) -> Client:
+        client = await GrantTypeBase.validate_request(self, request)
+
+        if not request.post.redirect_uri:
+            raise InvalidRedirectURIError(
+                request=request, description="Mismatching redirect URI."
+            )
+
+        if not client.check_redirect_uri(request.post.redirect_uri):
+            raise InvalidRedirectURIError(
+                request=request, description="Invalid redirect URI."
+            )
+
+        if not request.post.code:
+            raise InvalidRequestError(
+                request=request, description="Missing code parameter."
+            )
+
+        # The code is gone once this returns, even if the checks below fail
+        authorization_code = await self.storage.consume_authorization_code(
+            request=request, client_id=client.client_id, code=request.post.code
+        )
+
+        if not authorization_code:
+            raise InvalidGrantError(request=request)
+
+        if (
+            authorization_code.code_challenge
+            and authorization_code.code_challenge_method
+        ):
+            if not request.post.code_verifier:
+                raise InvalidRequestError(
+                    request=request, description="Code verifier required."
+                )
+
+            if not authorization_code.check_code_challenge(request.post.code_verifier):
+                raise MismatchingStateError(request=request)
+
+        if authorization_code.is_expired:
+            raise InvalidGrantError(request=request)
+
+        # Tokens and the id_token are issued on behalf of the approving user
+        request.extra["user_id"] = authorization_code.user_id
+        request.extra["auth_time"] = authorization_code.auth_time
+        self.authorization_code = authorization_code
+        self.scope = authorization_code.scope
+        return client
+
+    async def create_token_response(
+        self, request: Request, client: Client
+    ) -> TokenResponse:
+        # The code was already deleted in validate_request
+        token_response = await GrantTypeBase.create_token_response(
+            self, request, client
+        )
+        if "openid" not in enforce_list(self.scope):
+            return token_response
+
+        id_token = await self.storage.get_id_token(
+            request=request,
+            client_id=client.client_id,
+            scope=self.scope,
+            redirect_uri=self.authorization_code.redirect_uri,
+            response_type="code",
+            nonce=self.authorization_code.nonce,
+        )
+        return IdTokenResponse(**asdict(token_response), id_token=id_token)
+
+
+class UserRefreshTokenGrantType(RefreshTokenGrantType):
+    """Refresh token grant that redeems the refresh token through
+    `storage.rotate_refresh_token`, so concurrent refreshes with the same
+    token cannot both succeed, and issues the new token to the same user as
+    the old one, so /userinfo keeps working after a refresh."""
+
+    async def create_token_response(
+        self, request: Request, client: Client
+    ) -> TokenResponse:
+        # The old token is revoked once this returns, even if it had expired
+        old_token = await self.storage.rotate_refresh_token(
+            request=request,
+            client_id=client.client_id,
+            refresh_token=request.post.refresh_token,
+        )
+
+        if not old_token or old_token.refresh_token_expired:
+            raise InvalidGrantError(request=request)
+
+        # The new token may only narrow the scope of the old one
+        new_scope = old_token.scope
+        if request.post.scope:
+            new_scope = enforce_str(
+                list(
+                    set(enforce_list(old_token.scope))
+                    & set(enforce_list(request.post.scope))
+                )
+            )
+
+        request.extra["user_id"] = old_token.user_id
+        token = await self.storage.create_token(
+            request=request,
+            client_id=client.client_id,
+            scope=new_scope,
+            access_token=generate_token(42),
+            refresh_token=generate_token(48),
+        )
+
+        return TokenResponse(
+            expires_in=token.expires_in,
+            refresh_token_expires_in=token.refresh_token_expires_in,
+            access_token=token.access_token,
+            refresh_token=token.refresh_token,
+            scope=token.scope,
+            token_type=token.token_type,
+        )
+
+
+@dataclass
+class AccessTokenResponse:
+    """Token response without the refresh fields, for grants that never
+    issue a refresh token (RFC 6749 section 4.4.3)."""
+
+    expires_in: int
+    access_token: str
+    scope: str
+    token_type: str = "Bearer"
+
+
+class ReusableTokenCache:
+    """Still-valid client_credentials tokens keyed by (client_id, scope)."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._tokens: Dict[Tuple[str, str], Token] = {}
+
+    @staticmethod
+    def _key(client_id: str, scope: str) -> Tuple[str, str]:
+        return client_id, " ".join(sorted(set(enforce_list(scope))))
+
+    def get(self, client_id: str, scope: str) -> Optional[Token]:
+        token = self._tokens.get(self._key(client_id, scope))
+        if token and time.time() < token.issued_at + min(self.window, token.expires_in):
+            return token
+        return None
+
+    def put(self, token: Token):
+        if self.window > 0:
+            self._tokens[self._key(token.client_id, token.scope)] = token
+
+    def discard(self, client_id: str):
+        for key in [key for key in self._tokens if key[0] == client_id]:
+            del self._tokens[key]
+
+
+reusable_tokens = ReusableTokenCache(window=CLIENT_CREDENTIALS_REUSE_WINDOW)
+
+
+class ReusableClientCredentialsGrantType(ClientCredentialsGrantType):
+    """Client credentials grant for machine-to-machine clients.
+
+    Issues access tokens only (there is no user to refresh on behalf of) and
+    answers identical (client, scope) requests inside the reuse window from
+    `reusable_tokens`, so steady polling does not write a row per request.
+    """
+
+    async def create_token_response(
+        self, request: Request, client: Client
+    ) -> AccessTokenResponse:
+        if self.scope is None:
+            raise RuntimeError("validate_request() must be called first")
+
+        token = reusable_tokens.get(client.client_id, self.scope)
+        if token is None:
+            token = await self.storage.create_token(
+                request=request,
+                client_id=client.client_id,
+                scope=self.scope,
+                access_token=generate_token(42),
+                refresh_token=None,
+            )
+            reusable_tokens.put(token)
+
+        return AccessTokenResponse(
+            expires_in=token.issued_at + token.expires_in - int(time.time()),
+            access_token=token.access_token,
+            scope=token.scope,
+            token_type=token.token_type,
+        )
+
+
+class AuthorizationPendingError(OAuth2Error):
+    error = "authorization_pending"
+    description = "The user has not yet approved the device."
+
+
+class ExpiredTokenError(OAuth2Error):
+    error = "expired_token"
+    description = "The device code has expired."
+
+
+class DeviceCodeGrantType(GrantTypeBase):
+    """Device access token request (RFC 8628 section 3.4).
+
+    Instead of answering `authorization_pending` immediately, the poll is held
+    open for up to `LONG_POLL_TIMEOUT` seconds until the user approves or
+    denies the device, so waiting devices issue no storage queries.
+    """
+
+    async def validate_request(self, request: Request) -> Client:
+        client = await super().validate_request(request)
+
+        if not request.extra.get("device_code"):
+            raise InvalidRequestError(
+                request=request, description="Missing device_code parameter."
+            )
+
+        return client
+
+    async def create_token_response(
+        self, request: Request, client: Client
+    ) -> TokenResponse:
+        device_code = request.extra["device_code"]
+        authorization = await device_authorizations.wait(
+            device_code, client.client_id, timeout=LONG_POLL_TIMEOUT
+        )
+
+        if authorization is None:
+            raise InvalidGrantError(request=request)
+
+        if authorization.is_expired:
+            device_authorizations.consume(device_code)
+            raise ExpiredTokenError(request=request)
+
+        if authorization.status == "pending":
+            raise AuthorizationPendingError(request=request)
+
+        # Concurrent polls for the same device code: only the first gets a token
+        if device_authorizations.consume(device_code) is None:
+            raise InvalidGrantError(request=request)
+
+        if authorization.status == "denied":
+            raise AccessDeniedError(request=request)
+
+        request.extra["user_id"] = authorization.user_id
+        self.scope = authorization.scope
+        return await super().create_token_response(request, client)
@@ -0,0 +1,73 @@
+"""Startup warm-up and the readiness state behind /readyz.
+
+Everything a first request would otherwise pay for lazily is done once in
+the lifespan: pool connections, statement compilation for each storage
+lookup and write, the client table, the argon2 backend and the OIDC
+signing key.
+"""
+
+from sqlalchemy import text
+from src.auth.security import get_password_hash, verify_password
+from src.clients import client_registry
+from src.database import engine
+from src.oauth import storage
+from src.oidc import jwks
+from typing import Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.warmup_seconds: Optional[float] = None
+
+    async def db_latency(self) -> float:
+        started = time.perf_counter()
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return time.perf_counter() - started
+
+
+# Global Instance
+readiness = Readiness()
+
+
+async def _open_connection():
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def warm_up():
+    started = time.perf_counter()
+
+    # Hold pool_size connections open at once so the pool keeps all of them.
+    # Only QueuePool has a size; StaticPool and NullPool get one connection.
+    pool_size = getattr(engine.sync_engine.pool, "size", lambda: 1)()
+    await asyncio.gather(*(_open_connection() for _ in range(pool_size)))
+
+    # Run every storage statement once, lookups with keys that match
+    # nothing and inserts rolled back, which fills SQLAlchemy's compiled
+    # statement cache
+    clients = await client_registry.load()
+    await storage.get_token(request=None, access_token="warm-up")
+    await storage.get_token(request=None, refresh_token="warm-up", client_id="warm-up")
+    await storage.get_authorization_code(None, client_id="warm-up", code="warm-up")
+    await storage.consume_authorization_code(None, client_id="warm-up", code="warm-up")
+    await storage.revoke_token(None, access_token="warm-up")
+    await storage.rotate_refresh_token(
+        None, client_id="warm-up", refresh_token="warm-up"
+    )
+    await storage.warm_up_writes()
+
+    verify_password("warm-up", get_password_hash("warm-up"))
+    jwks()
+
+    readiness.warmup_seconds = time.perf_counter() - started
+    readiness.ready = True
+    logger.info(
+        f"Warm-up done in {readiness.warmup_seconds:.3f}s ({clients} clients cached)"
+    )
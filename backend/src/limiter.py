@@ -0,0 +1,168 @@
+from collections import deque
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Deque, Dict, Optional
+import asyncio
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit driven by observed request latency.
+
+    Each request finishing under `target_latency` raises the limit by
+    1/limit (about +1 per full window); a slower one multiplies it by
+    `backoff`. Requests beyond the limit wait in a bounded queue, and are
+    shed immediately once that queue is full.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        target_latency: float,
+        min_limit: int = 1,
+        max_limit: int = 500,
+        backoff: float = 0.9,
+        max_queue: int = 100,
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.target_latency = target_latency
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.shed = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    async def acquire(self, timeout: float) -> bool:
+        if self._has_capacity() and not self._waiters:
+            self.in_flight += 1
+            return True
+
+        if len(self._waiters) >= self.max_queue or timeout <= 0:
+            self.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() counts the slot as taken before resolving the waiter
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except TimeoutError:
+            # release() may have handed over the slot just as the deadline
+            # passed; take it, since nobody else will give it back
+            if waiter.done() and not waiter.cancelled():
+                return True
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self.shed += 1
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, latency: Optional[float] = None):
+        self.in_flight -= 1
+        if latency is not None:
+            if latency > self.target_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "shed": self.shed,
+        }
+
+
+class ConcurrencySlot:
+    def __init__(self, limiter: AdaptiveLimiter, started: float):
+        self.limiter = limiter
+        self.started = started
+        self.released = False
+
+    def release(self, record_latency: bool = True):
+        if not self.released:
+            self.released = True
+            loop = asyncio.get_running_loop()
+            self.limiter.release(loop.time() - self.started if record_latency else None)
+
+
+def release_concurrency_slot(request: Request):
+    """Gives the slot back early without feeding the limiter a latency sample.
+
+    For requests that intentionally park (e.g. device-code long polls), which
+    would otherwise hold a slot and read as overload.
+    """
+    slot = request.scope.get("state", {}).get("concurrency_slot")
+    if slot:
+        slot.release(record_latency=False)
+
+
+class ConcurrencyLimitMiddleware:
+    """Routes each request to a limiter pool by path and sheds with 503 when
+    the pool cannot admit it before its deadline."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        pools: Dict[str, AdaptiveLimiter],
+        routes: Dict[str, str],
+        default_pool: str,
+        deadlines: Dict[str, float],
+    ):
+        self.app = app
+        self.pools = pools
+        self.routes = routes
+        self.default_pool = default_pool
+        self.deadlines = deadlines
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        pool = self.routes.get(scope["path"], self.default_pool)
+        limiter = self.pools[pool]
+        if not await limiter.acquire(timeout=self.deadlines[pool]):
+            response = JSONResponse(
+                status_code=503,
+                content={"error": "temporarily_unavailable"},
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        slot = ConcurrencySlot(limiter, asyncio.get_running_loop().time())
+        scope.setdefault("state", {})["concurrency_slot"] = slot
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            slot.release()
+
+
+# Heavy routes hash passwords or write tokens; everything else is a cheap read
+HEAVY_ROUTES = {"/login": "heavy", "/token": "heavy"}
+limiter_pools = {
+    "heavy": AdaptiveLimiter("heavy", initial_limit=8, target_latency=0.5),
+    "light": AdaptiveLimiter("light", initial_limit=64, target_latency=0.05),
+}
+limiter_deadlines = {"heavy": 2.0, "light": 0.5}
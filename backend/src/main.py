@@ -2,6 +2,20 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from src.database import engine, Base, SessionLocal
 from src.routes import router
+from src.audit import audit_log
+from src.health import readiness, warm_up
+from src.limiter import (
+    HEAVY_ROUTES,
+    ConcurrencyLimitMiddleware,
+    limiter_deadlines,
+    limiter_pools,
+)
+from src.profiling import (
+    PROFILING_ENABLED,
+    ProfilingMiddleware,
+    profile_store,
+    stack_sampler,
+)
 import uvicorn
 import logging
 import traceback
@@ -21,6 +35,9 @@ async def lifespan(app: FastAPI):
         # async with engine.begin() as conn:
         #     await conn.run_sync(Base.metadata.create_all)
 
+        await audit_log.start()
+        await warm_up()
+
         logger.info("Startup complete.")
     except Exception as e:
         logger.error(f"Startup failed: {e}")
@@ -30,6 +47,8 @@ async def lifespan(app: FastAPI):
 
     yield
     # Shutdown logic if any can go here
+    readiness.ready = False
+    await audit_log.stop()
 
 
 app = FastAPI(
@@ -53,6 +72,19 @@ app.add_middleware(
 # Add Session Middleware for Auth Session
 app.add_middleware(SessionMiddleware, secret_key="super_secret_key")
 
+# Only installed when switched on, so unprofiled deployments pay nothing
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, store=profile_store, sampler=stack_sampler)
+
+# Outermost, so overload is shed before any other work is done
+app.add_middleware(
+    ConcurrencyLimitMiddleware,
+    pools=limiter_pools,
+    routes=HEAVY_ROUTES,
+    default_pool="light",
+    deadlines=limiter_deadlines,
+)
+
 app.include_router(router)
 
 
@@ -1,10 +1,86 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Boolean,
+    ForeignKey,
+    Index,
+    LargeBinary,
+    UniqueConstraint,
+)
+from dataclasses import dataclass
+from typing import Optional
 from src.database import Base
 from aioauth.models import Client as AioAuthClient
 from aioauth.models import Token as AioAuthToken
 from aioauth.models import AuthorizationCode as AioAuthAuthorizationCode
 
 
+@dataclass
+class ScopedToken(AioAuthToken):
+    """aioauth token carrying the precomputed `scope_registry` bitmask and
+    the resource owner, if any."""
+
+    scope_mask: int = 0
+    user_id: Optional[int] = None
+
+
+@dataclass
+class UserAuthorizationCode(AioAuthAuthorizationCode):
+    """aioauth authorization code carrying the user who approved it."""
+
+    user_id: Optional[int] = None
+
+
+# The builders below take either an ORM object or a Core row of the matching
+# table, which expose the same attribute names. Storage lookups pass rows
+# straight in and skip the ORM layer.
+
+
+def aioauth_client(row) -> AioAuthClient:
+    return AioAuthClient(
+        client_id=row.client_id,
+        client_secret=row.client_secret,
+        grant_types=row.grant_types.split(",") if row.grant_types else [],
+        response_types=row.response_types.split(",") if row.response_types else [],
+        scope=row.scope,
+        redirect_uris=row.redirect_uris.split(",") if row.redirect_uris else [],
+    )
+
+
+def aioauth_token(
+    row, access_token: str, refresh_token: Optional[str] = None
+) -> ScopedToken:
+    return ScopedToken(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        scope=row.scope,
+        issued_at=row.issued_at,
+        expires_in=row.expires_in,
+        refresh_token_expires_in=900,
+        client_id=row.client_id,
+        revoked=row.revoked,
+        scope_mask=row.scope_mask or 0,
+        user_id=row.user_id,
+    )
+
+
+def aioauth_code(row, code: str) -> UserAuthorizationCode:
+    return UserAuthorizationCode(
+        code=code,
+        client_id=row.client_id,
+        redirect_uri=row.redirect_uri,
+        response_type=row.response_type,
+        scope=row.scope,
+        auth_time=row.auth_time,
+        expires_in=row.expires_in,
+        code_challenge=row.code_challenge,
+        code_challenge_method=row.code_challenge_method,
+        nonce=row.nonce,
+        user_id=row.user_id,
+    )
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -24,50 +100,39 @@ class Client(Base):
     redirect_uris = Column(String)
 
     def to_aioauth_client(self) -> AioAuthClient:
-        return AioAuthClient(
-            client_id=self.client_id,
-            client_secret=self.client_secret,
-            grant_types=[g for g in self.grant_types.split(",")]
-            if self.grant_types
-            else [],
-            response_types=[r for r in self.response_types.split(",")]
-            if self.response_types
-            else [],
-            scope=self.scope,
-            redirect_uris=self.redirect_uris.split(",") if self.redirect_uris else [],
-        )
+        return aioauth_client(self)
 
 
 class Token(Base):
     __tablename__ = "tokens"
+    # Keyset pagination of one user's or client's tokens, newest first
+    __table_args__ = (
+        Index("ix_tokens_user_id_issued_at", "user_id", "issued_at", "id"),
+        Index("ix_tokens_client_id_issued_at", "client_id", "issued_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    access_token = Column(String, unique=True, index=True)
-    refresh_token = Column(String, unique=True, index=True)
+    # SHA-256 digests; plaintext tokens are only ever held by the client
+    access_token_hash = Column(LargeBinary(32), unique=True, index=True)
+    refresh_token_hash = Column(LargeBinary(32), unique=True, index=True)
     scope = Column(String)
+    scope_mask = Column(Integer, default=0)
     issued_at = Column(Integer)
     expires_in = Column(Integer)
     client_id = Column(String, ForeignKey("clients.client_id"))
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     revoked = Column(Boolean, default=False)
 
-    def to_aioauth_token(self) -> AioAuthToken:
-        return AioAuthToken(
-            access_token=self.access_token,
-            refresh_token=self.refresh_token,
-            scope=self.scope,
-            issued_at=self.issued_at,
-            expires_in=self.expires_in,
-            refresh_token_expires_in=900,
-            client_id=self.client_id,
-            revoked=self.revoked,
-        )
+    def to_aioauth_token(
+        self, access_token: str, refresh_token: Optional[str] = None
+    ) -> ScopedToken:
+        return aioauth_token(self, access_token, refresh_token)
 
 
 class AuthorizationCode(Base):
     __tablename__ = "authorization_codes"
 
-    code = Column(String, primary_key=True, index=True)
+    code_hash = Column(LargeBinary(32), primary_key=True)
     client_id = Column(String, ForeignKey("clients.client_id"))
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     redirect_uri = Column(String)
@@ -79,17 +144,16 @@ class AuthorizationCode(Base):
     code_challenge_method = Column(String, nullable=True)
     nonce = Column(String, nullable=True)
 
-    def to_aioauth_code(self) -> AioAuthAuthorizationCode:
-        print(f"[debug] {self.code}")
-        return AioAuthAuthorizationCode(
-            code=self.code,
-            client_id=self.client_id,
-            redirect_uri=self.redirect_uri,
-            response_type=self.response_type,
-            scope=self.scope,
-            auth_time=self.auth_time,
-            expires_in=self.expires_in,
-            code_challenge=self.code_challenge,
-            code_challenge_method=self.code_challenge_method,
-            nonce=self.nonce,
-        )
+    def to_aioauth_code(self, code: str) -> UserAuthorizationCode:
+        return aioauth_code(self, code)
+
+
+class ConsentGrant(Base):
+    __tablename__ = "consent_grants"
+    __table_args__ = (UniqueConstraint("user_id", "client_id", "scope"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    client_id = Column(String, ForeignKey("clients.client_id"))
+    scope = Column(String)  # Normalised: sorted, space-separated
+    granted_at = Column(Integer)
@@ -2,69 +2,231 @@ from aioauth.server import AuthorizationServer
 from aioauth.storage import BaseStorage
 from aioauth.requests import Request
 from aioauth.models import Token, Client, AuthorizationCode
-from src.database import get_db, SessionLocal
+from src.database import get_db, SessionLocal, engine
+from src.auth.security import hash_token
+from src.audit import audit_log
 from src.models import (
     Token as TokenModel,
-    Client as ClientModel,
     AuthorizationCode as CodeModel,
+    aioauth_code,
+    aioauth_token,
 )
-from sqlalchemy import select
+from sqlalchemy import Select, bindparam, delete, insert, select, update
+from src.clients import client_registry
+from src.scopes import scope_registry
+from src.oidc import create_id_token
+from src.profiling import staged
+from src.singleflight import SingleFlight
+from src.device import DEVICE_CODE_GRANT
+from src.grants import (
+    AtomicAuthorizationCodeGrantType,
+    DeviceCodeGrantType,
+    ReusableClientCredentialsGrantType,
+    UserRefreshTokenGrantType,
+    reusable_tokens,
+)
+from functools import lru_cache
+from types import SimpleNamespace
 from typing import Optional
 from datetime import datetime, timezone
+import logging
+import secrets
 import time
 
+logger = logging.getLogger(__name__)
+
+
+def _request_user_id(request: Optional[Request]) -> Optional[int]:
+    """The resource owner: the logged-in user on /authorize, or the user
+    bound to the redeemed authorization code or refresh token on /token."""
+    user = getattr(request, "user", None)
+    if user:
+        return user.id
+    return getattr(request, "extra", {}).get("user_id")
+
+
+# Hot paths run prebuilt Core statements on a bare connection: the statement
+# objects and their compiled SQL are reused across calls, and each row maps
+# straight to the aioauth model with no Session or identity map in between.
+_tokens = TokenModel.__table__
+_codes = CodeModel.__table__
+
+_INSERT_TOKEN = insert(_tokens).returning(_tokens.c.id)
+_SELECT_CODE = select(_codes).where(
+    _codes.c.code_hash == bindparam("code_hash"),
+    _codes.c.client_id == bindparam("client_id"),
+)
+_DELETE_CODE = delete(_codes).where(
+    _codes.c.code_hash == bindparam("code_hash"),
+    _codes.c.client_id == bindparam("client_id"),
+)
+_CONSUME_CODE = _DELETE_CODE.returning(*_codes.c)
+
+
+@lru_cache(maxsize=None)
+def _select_token(by_access: bool, by_refresh: bool, by_client: bool) -> Select:
+    stmt = select(_tokens)
+    if by_access:
+        stmt = stmt.where(_tokens.c.access_token_hash == bindparam("access_hash"))
+    if by_refresh:
+        stmt = stmt.where(_tokens.c.refresh_token_hash == bindparam("refresh_hash"))
+    if by_client:
+        stmt = stmt.where(_tokens.c.client_id == bindparam("client_id"))
+    return stmt
+
+
+@lru_cache(maxsize=None)
+def _revoke_token(by_refresh: bool):
+    column = _tokens.c.refresh_token_hash if by_refresh else _tokens.c.access_token_hash
+    return (
+        update(_tokens)
+        .where(column == bindparam("token_hash"))
+        .values(revoked=True)
+        .returning(_tokens.c.id, _tokens.c.client_id, _tokens.c.user_id)
+    )
+
+
+_ROTATE_REFRESH_TOKEN = (
+    update(_tokens)
+    .where(
+        _tokens.c.refresh_token_hash == bindparam("refresh_hash"),
+        _tokens.c.client_id == bindparam("owner_id"),
+        _tokens.c.revoked.is_(False),
+    )
+    .values(revoked=True)
+    .returning(*_tokens.c)
+)
+
+
+def _token_row(
+    client_id: Optional[str],
+    scope: str,
+    access_token: str,
+    refresh_token: Optional[str],
+    user_id: Optional[int],
+) -> dict:
+    return {
+        "client_id": client_id,
+        "scope": scope,
+        "scope_mask": scope_registry.mask(scope),
+        "access_token_hash": hash_token(access_token),
+        "refresh_token_hash": hash_token(refresh_token) if refresh_token else None,
+        "expires_in": 300,
+        "issued_at": int(datetime.now(tz=timezone.utc).timestamp()),
+        "user_id": user_id,
+        "revoked": False,
+    }
+
+
+def _code_model(
+    client_id: Optional[str],
+    scope: str,
+    response_type: str,
+    redirect_uri: str,
+    code: str,
+    code_challenge_method: Optional[str],
+    code_challenge: Optional[str],
+    nonce: Optional[str],
+    user_id: Optional[int],
+) -> CodeModel:
+    return CodeModel(
+        code_hash=hash_token(code),
+        client_id=client_id,
+        redirect_uri=redirect_uri,
+        response_type=response_type,
+        scope=scope,
+        auth_time=int(time.time()),
+        expires_in=600,
+        code_challenge=code_challenge,
+        code_challenge_method=code_challenge_method,
+        nonce=nonce,
+        user_id=user_id,
+    )
+
 
 class SQLAlchemyStorage(BaseStorage):
+    def __init__(self):
+        # Parallel requests presenting the same token share one SELECT
+        self.token_lookups = SingleFlight("get_token")
+
+    @staged("storage.get_client")
     async def get_client(
         self, request: Request, client_id: str, client_secret: Optional[str] = None
     ) -> Optional[Client]:
-        async with SessionLocal() as session:
-            stmt = select(ClientModel).where(ClientModel.client_id == client_id)
-            if client_secret:
-                stmt = stmt.where(ClientModel.client_secret == client_secret)
-            result = await session.execute(stmt)
-            client_model = result.scalar_one_or_none()
-            if client_model:
-                return client_model.to_aioauth_client()
-        return None
+        client = await client_registry.get(client_id)
+        if client and client_secret:
+            # A public client has no secret, so presenting one cannot match
+            if client.client_secret is None or not secrets.compare_digest(
+                client.client_secret.encode(), client_secret.encode()
+            ):
+                return None
+        return client
 
+    @staged("storage.create_token")
     async def create_token(
         self,
         request: Request,
         client_id: str,
         scope: str,
         access_token: str,
-        refresh_token: str,
+        refresh_token: Optional[str] = None,
     ) -> Token:
-        async with SessionLocal() as session:
-            token = TokenModel(
-                client_id=client_id,
-                scope=scope,
-                access_token=access_token,
-                refresh_token=refresh_token,
-                expires_in=300,
-                issued_at=int(datetime.now(tz=timezone.utc).timestamp()),
-                user_id=getattr(request, "user", None).id
-                if getattr(request, "user", None)
-                else None,
-            )
-            session.add(token)
-            await session.commit()
-            return token.to_aioauth_token()
+        row = _token_row(
+            client_id, scope, access_token, refresh_token, _request_user_id(request)
+        )
+        async with engine.begin() as conn:
+            token_id = (await conn.execute(_INSERT_TOKEN, row)).scalar_one()
+        grant_type = request.post.grant_type if request else None
+        audit_log.emit(
+            "token_refreshed" if grant_type == "refresh_token" else "token_issued",
+            token_id=token_id,
+            client_id=client_id,
+            user_id=row["user_id"],
+            scope=scope,
+            grant_type=grant_type,
+        )
+        return aioauth_token(SimpleNamespace(**row), access_token, refresh_token)
 
+    @staged("storage.get_token")
     async def get_token(
-        self, request: Request, access_token: str, refresh_token: Optional[str] = None
+        self,
+        request: Request,
+        access_token: Optional[str] = None,
+        refresh_token: Optional[str] = None,
+        client_id: Optional[str] = None,
+        token_type: Optional[str] = None,
     ) -> Optional[Token]:
-        async with SessionLocal() as session:
-            stmt = select(TokenModel).where(TokenModel.access_token == access_token)
-            if refresh_token:
-                stmt = stmt.where(TokenModel.refresh_token == refresh_token)
-            result = await session.execute(stmt)
-            token_model = result.scalar_one_or_none()
-            if token_model:
-                return token_model.to_aioauth_token()
-        return None
+        if not access_token and not refresh_token:
+            return None
+        if refresh_token:
+            # A shared read of a refresh token would let concurrent refresh
+            # grants all see it unrevoked
+            return await self._fetch_token(access_token, refresh_token, client_id)
+        return await self.token_lookups.do(
+            (access_token, refresh_token, client_id),
+            lambda: self._fetch_token(access_token, refresh_token, client_id),
+        )
 
+    async def _fetch_token(
+        self,
+        access_token: Optional[str],
+        refresh_token: Optional[str],
+        client_id: Optional[str],
+    ) -> Optional[Token]:
+        stmt = _select_token(bool(access_token), bool(refresh_token), bool(client_id))
+        params = {"client_id": client_id}
+        if access_token:
+            params["access_hash"] = hash_token(access_token)
+        if refresh_token:
+            params["refresh_hash"] = hash_token(refresh_token)
+        async with engine.connect() as conn:
+            row = (await conn.execute(stmt, params)).first()
+        if row is None:
+            return None
+        # Only the digests are stored, so echo back what the caller presented
+        return aioauth_token(row, access_token or "", refresh_token)
+
+    @staged("storage.create_authorization_code")
     async def create_authorization_code(
         self,
         *,
@@ -78,90 +240,154 @@ class SQLAlchemyStorage(BaseStorage):
         code_challenge: Optional[str] = None,
         nonce: Optional[str] = None,
     ) -> AuthorizationCode:
-        print(
-            f"DEBUG: Saving auth code: {code} for client: {client_id}, redirect_uri: {redirect_uri}"
-        )
+        logger.debug("Saving auth code for client %s", client_id)
         try:
             async with SessionLocal() as session:
-                auth_code = CodeModel(
-                    code=code,
-                    client_id=client_id,
-                    redirect_uri=redirect_uri,
-                    response_type=response_type,
-                    scope=scope,
-                    auth_time=int(time.time()),
-                    expires_in=600,
-                    code_challenge=code_challenge,
-                    code_challenge_method=code_challenge_method,
-                    nonce=nonce,
-                    user_id=getattr(request, "user", None).id
-                    if getattr(request, "user", None)
-                    else None,
+                auth_code = _code_model(
+                    client_id,
+                    scope,
+                    response_type,
+                    redirect_uri,
+                    code,
+                    code_challenge_method,
+                    code_challenge,
+                    nonce,
+                    _request_user_id(request),
                 )
                 session.add(auth_code)
                 await session.commit()
-                print("DEBUG: Auth code saved successfully")
-                return auth_code.to_aioauth_code()
-        except Exception as e:
-            import logging
-
-            logging.error(f"Error creating auth code: {e}")
-            import traceback
-
-            logging.error(traceback.format_exc())
-            raise e
+                audit_log.emit(
+                    "code_issued",
+                    client_id=client_id,
+                    user_id=auth_code.user_id,
+                    scope=scope,
+                )
+                return auth_code.to_aioauth_code(code)
+        except Exception:
+            logger.exception("Error creating auth code")
+            raise
 
+    @staged("storage.get_authorization_code")
     async def get_authorization_code(
         self, request: Request, client_id: str, code: str
     ) -> Optional[AuthorizationCode]:
-        print(f"DEBUG: Retrieving auth code: {code} for client: {client_id}")
-        async with SessionLocal() as session:
-            stmt = select(CodeModel).where(
-                CodeModel.code == code, CodeModel.client_id == client_id
-            )
-            result = await session.execute(stmt)
-            code_model = result.scalar_one_or_none()
-            if code_model:
-                print(f"DEBUG: Found auth code: {code_model.code}")
-                return code_model.to_aioauth_code()
-            else:
-                print("DEBUG: Auth code not found")
-        return None
+        params = {"code_hash": hash_token(code), "client_id": client_id}
+        async with engine.connect() as conn:
+            row = (await conn.execute(_SELECT_CODE, params)).first()
+        if row is None:
+            logger.debug("Auth code not found for client %s", client_id)
+            return None
+        return aioauth_code(row, code)
 
+    @staged("storage.delete_authorization_code")
     async def delete_authorization_code(
         self, request: Request, client_id: str, code: str
     ):
-        async with SessionLocal() as session:
-            stmt = select(CodeModel).where(
-                CodeModel.code == code, CodeModel.client_id == client_id
+        params = {"code_hash": hash_token(code), "client_id": client_id}
+        async with engine.begin() as conn:
+            await conn.execute(_DELETE_CODE, params)
+
+    @staged("storage.consume_authorization_code")
+    async def consume_authorization_code(
+        self, request: Request, client_id: str, code: str
+    ) -> Optional[AuthorizationCode]:
+        """Deletes and returns the code in one statement, so only one caller can redeem it."""
+        params = {"code_hash": hash_token(code), "client_id": client_id}
+        async with engine.begin() as conn:
+            row = (await conn.execute(_CONSUME_CODE, params)).first()
+        if row is None:
+            return None
+        audit_log.emit("code_redeemed", client_id=client_id, user_id=row.user_id)
+        return aioauth_code(row, code)
+
+    @staged("storage.revoke_token")
+    async def revoke_token(
+        self,
+        request: Request,
+        refresh_token: Optional[str] = None,
+        client_id: Optional[str] = None,
+        token_type: Optional[str] = None,
+        access_token: Optional[str] = None,
+    ) -> None:
+        token = refresh_token or access_token
+        if not token:
+            return
+        stmt = _revoke_token(by_refresh=bool(refresh_token))
+        async with engine.begin() as conn:
+            row = (await conn.execute(stmt, {"token_hash": hash_token(token)})).first()
+        if row:
+            reusable_tokens.discard(row.client_id)
+            audit_log.emit(
+                "token_revoked",
+                token_id=row.id,
+                client_id=row.client_id,
+                user_id=row.user_id,
             )
-            result = await session.execute(stmt)
-            code_model = result.scalar_one_or_none()
-            if code_model:
-                await session.delete(code_model)
-                await session.commit()
 
-    async def revoke_token(self, request: Request, refresh_token: str) -> None:
+    @staged("storage.rotate_refresh_token")
+    async def rotate_refresh_token(
+        self, request: Request, client_id: str, refresh_token: str
+    ) -> Optional[Token]:
+        """Revokes and returns the token in one statement, so only one
+        caller can redeem a refresh token."""
+        params = {"refresh_hash": hash_token(refresh_token), "owner_id": client_id}
+        async with engine.begin() as conn:
+            row = (await conn.execute(_ROTATE_REFRESH_TOKEN, params)).first()
+        if row is None:
+            return None
+        audit_log.emit(
+            "token_revoked", token_id=row.id, client_id=client_id, user_id=row.user_id
+        )
+        return aioauth_token(row, "", refresh_token)
+
+    async def warm_up_writes(self):
+        """Runs the INSERTs behind create_token and create_authorization_code
+        once, in transactions that are rolled back, so their statements are
+        compiled before the first real request. Nothing is written or
+        audited."""
+        row = _token_row(None, "", "warm-up", "warm-up", None)
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            await conn.execute(_INSERT_TOKEN, row)
+            await transaction.rollback()
+
         async with SessionLocal() as session:
-            stmt = select(TokenModel).where(TokenModel.refresh_token == refresh_token)
-            result = await session.execute(stmt)
-            token_model = result.scalar_one_or_none()
-            if token_model:
-                token_model.revoked = True
-                await session.commit()
+            session.add(
+                _code_model(None, "", "code", "", "warm-up", None, None, None, None)
+            )
+            await session.flush()
+            await session.rollback()
 
+    @staged("storage.get_id_token")
     async def get_id_token(
         self,
         request: Request,
         client_id: str,
         scope: str,
-        response_type: str,
         redirect_uri: str,
-        nonce: str,
+        response_type: Optional[str] = None,
+        nonce: Optional[str] = None,
     ) -> str:
-        # Simple ID token implementation for OpenID Connect if needed, else optional
-        return "dummy_id_token"
+        user_id = _request_user_id(request)
+        if user_id is None:
+            raise ValueError("id_token requested without an authenticated user")
+        return await create_id_token(
+            user_id=user_id,
+            client_id=client_id,
+            scope=scope,
+            nonce=nonce,
+            auth_time=getattr(request, "extra", {}).get("auth_time"),
+        )
 
 
 storage = SQLAlchemyStorage()
-server = AuthorizationServer(storage=storage)
+server = AuthorizationServer(
+    storage=storage,
+    grant_types={
+        **AuthorizationServer.grant_types,
+        "authorization_code": AtomicAuthorizationCodeGrantType,
+        "client_credentials": ReusableClientCredentialsGrantType,
+        "refresh_token": UserRefreshTokenGrantType,
+        DEVICE_CODE_GRANT: DeviceCodeGrantType,
+    },
+)
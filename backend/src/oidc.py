@@ -0,0 +1,124 @@
+from aioauth.utils import enforce_list
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from functools import lru_cache
+from jwt.algorithms import RSAAlgorithm
+from sqlalchemy import event
+from src.database import SessionLocal
+from src.models import User
+from typing import Dict, Optional
+import hashlib
+import base64
+import json
+import jwt
+import logging
+import os
+import time
+
+ISSUER = os.environ.get("OIDC_ISSUER", "http://localhost:8000")
+ID_TOKEN_EXPIRES_IN = 3600
+
+
+@lru_cache(maxsize=1)
+def signing_key() -> rsa.RSAPrivateKey:
+    """RSA key used for id_tokens, parsed once per process.
+
+    Set OIDC_PRIVATE_KEY_PATH to a PEM file in any real deployment; without
+    it an ephemeral key is generated and tokens do not survive a restart.
+    """
+    path = os.environ.get("OIDC_PRIVATE_KEY_PATH")
+    if not path:
+        logging.warning("OIDC_PRIVATE_KEY_PATH not set, using an ephemeral key")
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    with open(path, "rb") as f:
+        return serialization.load_pem_private_key(f.read(), password=None)
+
+
+@lru_cache(maxsize=1)
+def jwks() -> dict:
+    jwk = json.loads(RSAAlgorithm.to_jwk(signing_key().public_key()))
+    # RFC 7638 thumbprint as key id
+    thumbprint = json.dumps(
+        {k: jwk[k] for k in ("e", "kty", "n")}, separators=(",", ":"), sort_keys=True
+    )
+    jwk["kid"] = (
+        base64.urlsafe_b64encode(hashlib.sha256(thumbprint.encode()).digest())
+        .rstrip(b"=")
+        .decode()
+    )
+    jwk.update(use="sig", alg="RS256")
+    return {"keys": [jwk]}
+
+
+class UserInfoCache:
+    """Per-user OIDC claims, dropped whenever the user row changes."""
+
+    def __init__(self):
+        self._claims: Dict[int, dict] = {}
+
+    async def get(self, user_id: int) -> Optional[dict]:
+        claims = self._claims.get(user_id)
+        if claims is None:
+            async with SessionLocal() as session:
+                user = await session.get(User, user_id)
+            if user is None:
+                return None
+            claims = self._claims[user_id] = {
+                "sub": str(user.id),
+                "preferred_username": user.username,
+                "name": user.username,
+            }
+        return claims
+
+    def invalidate(self, user_id: int):
+        self._claims.pop(user_id, None)
+
+    def clear(self):
+        self._claims.clear()
+
+
+# Global Instance
+userinfo_cache = UserInfoCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_userinfo(mapper, connection, target: User):
+    userinfo_cache.invalidate(target.id)
+
+
+def filter_claims(claims: dict, scope: str) -> dict:
+    scopes = set(enforce_list(scope))
+    if "profile" in scopes:
+        return dict(claims)
+    return {"sub": claims["sub"]}
+
+
+async def create_id_token(
+    user_id: int,
+    client_id: str,
+    scope: str,
+    nonce: Optional[str] = None,
+    auth_time: Optional[int] = None,
+) -> str:
+    claims = await userinfo_cache.get(user_id)
+    if claims is None:
+        raise ValueError(f"Unknown user {user_id}")
+
+    now = int(time.time())
+    payload = {
+        **filter_claims(claims, scope),
+        "iss": ISSUER,
+        "aud": client_id,
+        "iat": now,
+        "exp": now + ID_TOKEN_EXPIRES_IN,
+        "auth_time": auth_time or now,
+    }
+    if nonce:
+        payload["nonce"] = nonce
+    return jwt.encode(
+        payload,
+        signing_key(),
+        algorithm="RS256",
+        headers={"kid": jwks()["keys"][0]["kid"]},
+    )
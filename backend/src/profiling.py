@@ -0,0 +1,291 @@
+"""Opt-in sampling profiler for individual requests.
+
+Profiling is off unless PROFILING_ENABLED=1. Then a request is profiled
+when it carries a valid admin token in the `X-Profile` header, or when it
+is picked by PROFILE_SAMPLE_RATE. While it runs, a background thread
+samples the event loop thread's stack and folds every sample that falls
+inside the request into collapsed-stack lines, prefixed with the open
+`stage()` markers. Finished profiles go to a fixed
+number of slots on disk, so old ones are overwritten rather than piling up.
+
+The output is the folded format read by flamegraph.pl and speedscope:
+
+    curl -H "X-Admin-Token: $TOKEN" localhost:8000/admin/profiles/7 \\
+        | flamegraph.pl > token.svg
+
+ADMIN_SECRET only guards the header and the /admin/profiles endpoints; it
+does not switch profiling on. When PROFILING_ENABLED is unset, the
+middleware is not installed and `staged` returns functions undecorated.
+"""
+
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from src.auth.admin import verify_admin_token
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Dict, List, Optional
+import asyncio
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "./profiles")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_RING_SIZE = 64
+SAMPLE_INTERVAL = 0.005
+PROFILE_HEADER = "x-profile"
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "").lower() in ("1", "true")
+
+_current_profile: ContextVar[Optional["Profile"]] = ContextVar(
+    "current_profile", default=None
+)
+_no_stage = nullcontext()
+
+
+class Profile:
+    def __init__(self, profile_id: int, method: str, path: str, root_frame):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.status_code: Optional[int] = None
+        self.thread_id = threading.get_ident()
+        self.root_frame = root_frame
+        self.stages: List[str] = []
+        self.stage_seconds: Dict[str, float] = {}
+        self.samples: Counter = Counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        self.stages.append(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] = (
+                self.stage_seconds.get(name, 0.0) + time.perf_counter() - started
+            )
+            self.stages.pop()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "status_code": self.status_code,
+            "stages": self.stage_seconds,
+            "sample_count": sum(self.samples.values()),
+        }
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.items())
+
+
+def stage(name: str):
+    """Marks a section of the current request's profile; a no-op otherwise."""
+    profile = _current_profile.get()
+    if profile is None:
+        return _no_stage
+    return profile.stage(name)
+
+
+def staged(name: str):
+    """Decorator form of `stage()`. Leaves the function untouched when
+    profiling is disabled for the process."""
+
+    def decorator(func):
+        if not PROFILING_ENABLED:
+            return func
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}"
+
+
+class StackSampler:
+    """One daemon thread that samples the stacks of all running profiles.
+
+    A sample only counts for a profile when the request's root frame is on
+    the stack, i.e. when the event loop is actually running that request and
+    not some other one interleaved with it.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._active: List[Profile] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._active.append(profile)
+            self._wake.set()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="profile-sampler", daemon=True
+                )
+                self._thread.start()
+
+    def remove(self, profile: Profile):
+        with self._lock:
+            self._active.remove(profile)
+            if not self._active:
+                self._wake.clear()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for profile in self._active:
+                    frame = frames.get(profile.thread_id)
+                    stack = []
+                    while frame is not None and frame is not profile.root_frame:
+                        stack.append(_frame_name(frame))
+                        frame = frame.f_back
+                    if frame is None:
+                        continue
+                    stack.reverse()
+                    profile.samples[";".join(profile.stages + stack)] += 1
+
+
+class ProfileStore:
+    """Ring of `slots` JSON files; profile N lives in slot N % slots."""
+
+    def __init__(self, directory: str = PROFILE_DIR, slots: int = PROFILE_RING_SIZE):
+        self.directory = directory
+        self.slots = slots
+        self._next_id = None
+
+    def _path(self, profile_id: int) -> str:
+        return os.path.join(
+            self.directory, f"profile-{profile_id % self.slots:03d}.json"
+        )
+
+    def _load_slots(self) -> List[dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.startswith("profile-") and name.endswith(".json"):
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+        return profiles
+
+    def _last_id(self) -> int:
+        return max((p["id"] for p in self._load_slots()), default=0)
+
+    async def next_id(self) -> int:
+        if self._next_id is None:
+            # First use: continue after the profiles already on disk
+            last_id = await asyncio.to_thread(self._last_id)
+            if self._next_id is None:
+                self._next_id = last_id
+        self._next_id += 1
+        return self._next_id
+
+    def save(self, profile: Profile):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(profile.id)
+        with open(path + ".tmp", "w") as f:
+            json.dump({**profile.to_dict(), "collapsed": profile.collapsed()}, f)
+        os.replace(path + ".tmp", path)
+
+    def list(self) -> List[dict]:
+        profiles = self._load_slots()
+        for p in profiles:
+            p.pop("collapsed")
+        return sorted(profiles, key=lambda p: p["id"], reverse=True)
+
+    def get(self, profile_id: int) -> Optional[dict]:
+        try:
+            with open(self._path(profile_id)) as f:
+                profile = json.load(f)
+        except FileNotFoundError:
+            return None
+        # The slot may since have been reused by a newer profile
+        return profile if profile["id"] == profile_id else None
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        sampler: StackSampler,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+    ):
+        self.app = app
+        self.store = store
+        self.sampler = sampler
+        self.sample_rate = sample_rate
+
+    def _should_profile(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                return verify_admin_token(value.decode())
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(
+            await self.store.next_id(), scope["method"], scope["path"], sys._getframe()
+        )
+
+        async def send_with_id(message: Message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-profile-id", str(profile.id).encode()),
+                ]
+            await send(message)
+
+        token = _current_profile.set(profile)
+        self.sampler.add(profile)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.duration = time.perf_counter() - started
+            self.sampler.remove(profile)
+            _current_profile.reset(token)
+            await asyncio.to_thread(self.store.save, profile)
+
+
+# Global Instance
+profile_store = ProfileStore()
+stack_sampler = StackSampler()
@@ -1,14 +1,42 @@
 from typing import Annotated
 from fastapi import APIRouter, Depends, Request, HTTPException, Form, Query
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi.responses import (
+    RedirectResponse,
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from src.oauth import server
+from src.clients import client_registry
+from src.consent import consent_store
+from src.limiter import limiter_pools, release_concurrency_slot
+from src.profiling import profile_store, stage
+from src.auth.admin import require_admin
+from src.health import readiness
+from src.token_listing import (
+    MAX_PAGE_SIZE,
+    PAGE_SIZE,
+    decode_cursor,
+    iter_tokens,
+    list_tokens,
+)
+from src.device import (
+    DEVICE_CODE_GRANT,
+    POLL_INTERVAL,
+    VERIFICATION_URI,
+    device_authorizations,
+)
+from src.oidc import ISSUER, filter_claims, jwks, userinfo_cache
 from src.database import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from aioauth.requests import Request as AioAuthRequest, Post, Query as AioAuthQuery
 from aioauth.config import Settings as AioAuthSettings
-from src.models import User as UserModel
+from src.models import ScopedToken, User as UserModel
+from src.auth.dependencies import require_scopes
 from pydantic import BaseModel
+import asyncio
+import json
 import urllib.parse
 from dataclasses import fields
 
@@ -96,7 +124,16 @@ async def authorize_page(
             f"http://localhost:5173/login?next={urllib.parse.quote(str(request.url))}"
         )
 
-    # 3. If logged in, Redirect to Frontend Consent Page
+    # 3. If the user already approved these scopes for this client, skip consent
+    if await consent_store.is_covered(user.id, client_id, scope):
+        aio_request = _to_aioauth_request(request, dict(request.query_params))
+        aio_request.user = user
+        with stage("aioauth"):
+            response = await server.create_authorization_response(aio_request)
+        if response.status_code == 302:
+            return RedirectResponse(response.headers["Location"])
+
+    # 4. Otherwise, Redirect to Frontend Consent Page
     # Pass original params to the frontend consent page
     # Frontend will identify the client and ask user for approval
     # The Frontend will then POST back to /authorize with confirm=true
@@ -113,6 +150,19 @@ def _filter_dataclass_data(dataclass_type, data: dict) -> dict:
     return {k: v for k, v in data.items() if k in field_names}
 
 
+def _to_aioauth_request(request: Request, data: dict) -> AioAuthRequest:
+    return AioAuthRequest(
+        method=request.method,
+        query=AioAuthQuery(
+            **_filter_dataclass_data(AioAuthQuery, data)
+        ),  # Treat body data as query params for aioauth logic if needed
+        post=Post(**_filter_dataclass_data(Post, data)),
+        headers=dict(request.headers),
+        url=str(request.url),
+        settings=aio_settings,
+    )
+
+
 @router.post("/authorize")
 async def authorize_confirm(request: Request, db: AsyncSession = Depends(get_db)):
     # This endpoint is called by the Frontend Consent Page
@@ -132,31 +182,91 @@ async def authorize_confirm(request: Request, db: AsyncSession = Depends(get_db)
         data = dict(form)
 
     # Transform to AioAuth Request
-    aio_request = AioAuthRequest(
-        method=request.method,
-        query=AioAuthQuery(
-            **_filter_dataclass_data(AioAuthQuery, data)
-        ),  # Treat body data as query params for aioauth logic if needed
-        post=Post(**_filter_dataclass_data(Post, data)),
-        headers=dict(request.headers),
-        url=str(request.url),
-        settings=aio_settings,
-    )
+    aio_request = _to_aioauth_request(request, data)
     aio_request.user = user
 
     # Create authorization response (generates code)
     # This will check if 'response_type' etc are valid
-    response = await server.create_authorization_response(aio_request)
+    with stage("aioauth"):
+        response = await server.create_authorization_response(aio_request)
 
     # If redirect (Code generated), we return the redirect URL to frontend
     # so frontend can redirect the browser to the Client
     if response.status_code == 302:
-        return {"redirect_to": response.headers["Location"]}
+        location = response.headers["Location"]
+        # Error redirects (e.g. error=invalid_scope) are 302s too: only an
+        # issued code means the user actually approved
+        issued = urllib.parse.parse_qs(urllib.parse.urlparse(location).query)
+        if user and "code" in issued and "error" not in issued:
+            await consent_store.grant(user.id, data.get("client_id"), data.get("scope"))
+        return {"redirect_to": location}
 
     # If error
     return JSONResponse(content=response.content, status_code=response.status_code)
 
 
+@router.get("/consents")
+async def list_consents(request: Request):
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return await consent_store.list_grants(user_id)
+
+
+@router.delete("/consents/{client_id}")
+async def revoke_consent(request: Request, client_id: str):
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    revoked = await consent_store.revoke(user_id, client_id)
+    if not revoked:
+        raise HTTPException(status_code=404, detail="No consent for this client")
+    return {"revoked": revoked}
+
+
+@router.post("/device_authorization")
+async def device_authorization(
+    client_id: Annotated[str, Form(description="客户端 ID")],
+    client_secret: Annotated[str | None, Form(description="客户端密钥")] = None,
+    scope: Annotated[str | None, Form(description="申请的权限范围")] = None,
+):
+    client = await server.storage.get_client(
+        request=None, client_id=client_id, client_secret=client_secret
+    )
+    if not client:
+        return JSONResponse(status_code=401, content={"error": "invalid_client"})
+    if not client.check_grant_type(DEVICE_CODE_GRANT):
+        return JSONResponse(status_code=400, content={"error": "unauthorized_client"})
+    if scope and not client.check_scope(scope):
+        return JSONResponse(status_code=400, content={"error": "invalid_scope"})
+
+    device_code, authorization = device_authorizations.start(client_id, scope or "")
+    return {
+        "device_code": device_code,
+        "user_code": authorization.user_code,
+        "verification_uri": VERIFICATION_URI,
+        "verification_uri_complete": f"{VERIFICATION_URI}?user_code={authorization.user_code}",
+        "expires_in": device_authorizations.expires_in,
+        "interval": POLL_INTERVAL,
+    }
+
+
+@router.post("/device")
+async def device_confirm(
+    request: Request,
+    user_code: Annotated[str, Form(description="设备上显示的用户码")],
+    approve: Annotated[bool, Form(description="是否授权该设备 (true/false)")],
+):
+    # This endpoint is called by the Frontend Device Page
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    if not device_authorizations.decide(user_code, user_id, approve):
+        raise HTTPException(status_code=404, detail="Unknown or expired user code")
+    return {"approved": approve}
+
+
 @router.post("/token")
 async def token(
     request: Request,
@@ -181,8 +291,13 @@ async def token(
     refresh_token: Annotated[
         str | None, Form(description="刷新令牌 (仅在 refresh_token 模式下需要)")
     ] = None,
+    scope: Annotated[
+        str | None, Form(description="申请的权限范围 (client_credentials 模式下使用)")
+    ] = None,
+    device_code: Annotated[
+        str | None, Form(description="设备码 (仅在 device_code 模式下需要)")
+    ] = None,
 ):
-    print("DEBUG: Entering /token endpoint")
     # form = await request.form()
     # form_data = dict(form)
     # print(f"DEBUG: form_data keys: {list(form_data.keys())}")
@@ -202,12 +317,12 @@ async def token(
             "username": username,
             "password": password,
             "refresh_token": refresh_token,
+            "scope": scope,
         }.items()
         if v is not None
     }
 
     post_obj = Post(**_filter_dataclass_data(Post, form_data))
-    print(f"DEBUG: Created Post object: {post_obj}, type: {type(post_obj)}")
 
     aio_request = AioAuthRequest(
         method=request.method,
@@ -218,28 +333,150 @@ async def token(
         settings=aio_settings,
     )
 
-    print(f"DEBUG: aio_request.post type: {type(aio_request.post)}")
+    if grant_type == DEVICE_CODE_GRANT:
+        aio_request.extra["device_code"] = device_code
+        # Long polls park rather than work; don't let them count as load
+        release_concurrency_slot(request)
 
-    response = await server.create_token_response(aio_request)
+    with stage("aioauth"):
+        response = await server.create_token_response(aio_request)
     return JSONResponse(content=response.content, status_code=response.status_code)
 
 
 @router.get("/protected")
-async def protected_resource(request: Request):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header:
-        raise HTTPException(status_code=401, detail="Missing Authorization header")
+async def protected_resource(
+    token: Annotated[ScopedToken, Depends(require_scopes("read"))],
+):
+    return {
+        "message": "Hello, this is a protected resource!",
+        "user_id": token.client_id,
+    }
+
 
-    scheme, _, param = auth_header.partition(" ")
-    if scheme.lower() != "bearer":
-        raise HTTPException(status_code=401, detail="Invalid token scheme")
+@router.get("/userinfo")
+async def userinfo(
+    token: Annotated[ScopedToken, Depends(require_scopes("openid"))],
+):
+    if token.user_id is None:
+        raise HTTPException(status_code=403, detail="Token is not bound to a user")
 
-    token = await server.storage.get_token(request=None, access_token=param)
+    claims = await userinfo_cache.get(token.user_id)
+    if claims is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return filter_claims(claims, token.scope)
 
-    if not token or token.revoked:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
 
+@router.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz():
+    if not readiness.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    try:
+        latency = await readiness.db_latency()
+    except Exception as e:
+        return JSONResponse(
+            status_code=503, content={"status": "db_unavailable", "detail": str(e)}
+        )
     return {
-        "message": "Hello, this is a protected resource!",
-        "user_id": token.client_id,
+        "status": "ready",
+        "db_latency_ms": round(latency * 1000, 3),
+        "warmup_seconds": readiness.warmup_seconds,
+        "limiters": {name: pool.snapshot() for name, pool in limiter_pools.items()},
+        "single_flight": {
+            flight.name: flight.snapshot()
+            for flight in (server.storage.token_lookups, client_registry.misses)
+        },
+    }
+
+
+@router.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    return await asyncio.to_thread(profile_store.list)
+
+
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(
+    profile_id: int,
+    format: Annotated[str, Query(pattern="^(collapsed|json)$")] = "collapsed",
+):
+    profile = await asyncio.to_thread(profile_store.get, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json":
+        return profile
+    return PlainTextResponse(profile["collapsed"])
+
+
+TokenStatus = Annotated[
+    str | None, Query(pattern="^(active|expired|revoked)$", description="令牌状态")
+]
+
+
+def _token_owner(user_id: int | None, client_id: str | None):
+    if (user_id is None) == (client_id is None):
+        raise HTTPException(
+            status_code=400, detail="Pass exactly one of user_id or client_id"
+        )
+
+
+@router.get("/admin/tokens", dependencies=[Depends(require_admin)])
+async def admin_list_tokens(
+    user_id: int | None = None,
+    client_id: str | None = None,
+    status: TokenStatus = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = PAGE_SIZE,
+    cursor: str | None = None,
+):
+    _token_owner(user_id, client_id)
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed cursor")
+
+    items, next_cursor = await list_tokens(
+        user_id=user_id, client_id=client_id, status=status, limit=limit, after=after
+    )
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/admin/tokens/export", dependencies=[Depends(require_admin)])
+async def admin_export_tokens(
+    request: Request,
+    user_id: int | None = None,
+    client_id: str | None = None,
+    status: TokenStatus = None,
+):
+    _token_owner(user_id, client_id)
+    # The body streams for as long as the reader takes; don't count it as load
+    release_concurrency_slot(request)
+
+    async def lines():
+        async for item in iter_tokens(
+            user_id=user_id, client_id=client_id, status=status
+        ):
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/.well-known/jwks.json")
+async def jwks_document():
+    return jwks()
+
+
+@router.get("/.well-known/openid-configuration")
+async def openid_configuration():
+    return {
+        "issuer": ISSUER,
+        "authorization_endpoint": f"{ISSUER}/authorize",
+        "token_endpoint": f"{ISSUER}/token",
+        "userinfo_endpoint": f"{ISSUER}/userinfo",
+        "jwks_uri": f"{ISSUER}/.well-known/jwks.json",
+        "response_types_supported": ["code"],
+        "subject_types_supported": ["public"],
+        "id_token_signing_alg_values_supported": ["RS256"],
     }
@@ -0,0 +1,49 @@
+from aioauth.utils import enforce_list
+from typing import Dict, Optional
+
+# Bound on memoised scope strings, which come from client requests
+MASK_CACHE_SIZE = 1024
+
+
+class ScopeRegistry:
+    """Interns scope names into bit positions so a token's scopes can be
+    checked with a single bitwise AND.
+
+    Masks are persisted in `tokens.scope_mask`, so existing names must keep
+    their position: only ever append new scopes.
+    """
+
+    def __init__(self, *names: str):
+        self._bits: Dict[str, int] = {}
+        self._masks: Dict[Optional[str], int] = {}
+        for name in names:
+            self.register(name)
+
+    def register(self, name: str) -> int:
+        if name not in self._bits:
+            self._bits[name] = 1 << len(self._bits)
+            self._masks.clear()
+        return self._bits[name]
+
+    def mask(self, scope: str | None) -> int:
+        """Bitmask for a space-separated scope string; unknown names are ignored."""
+        mask = self._masks.get(scope)
+        if mask is None:
+            mask = 0
+            for name in enforce_list(scope or ""):
+                mask |= self._bits.get(name, 0)
+            if len(self._masks) >= MASK_CACHE_SIZE:
+                self._masks.clear()
+            self._masks[scope] = mask
+        return mask
+
+    def require(self, *names: str) -> int:
+        """Bitmask for scopes a route depends on; unknown names are a programming error."""
+        unknown = [name for name in names if name not in self._bits]
+        if unknown:
+            raise ValueError(f"Unregistered scopes: {', '.join(unknown)}")
+        return self.mask(" ".join(names))
+
+
+# Global Instance
+scope_registry = ScopeRegistry("openid", "profile", "email", "read", "write")
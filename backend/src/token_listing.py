@@ -0,0 +1,133 @@
+"""Admin listing of a user's or client's tokens.
+
+Pages are keyset-paginated on (issued_at, id), newest first, and served by
+the (user_id, issued_at, id) and (client_id, issued_at, id) indexes. The
+cost of a page does not depend on how deep into the never-pruned `tokens`
+table it is. The cursor is the position of the last row returned.
+"""
+
+from sqlalchemy import Select, and_, select, tuple_
+from src.database import engine
+from src.models import Token as TokenModel
+from typing import AsyncIterator, List, Optional, Tuple
+import base64
+import time
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+
+_tokens = TokenModel.__table__
+
+
+def encode_cursor(issued_at: int, token_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{issued_at}.{token_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """Raises ValueError for anything `encode_cursor` did not produce."""
+    issued_at, token_id = base64.urlsafe_b64decode(cursor).decode().split(".")
+    return int(issued_at), int(token_id)
+
+
+def _status(row, now: int) -> str:
+    if row.revoked:
+        return "revoked"
+    return "active" if row.issued_at + row.expires_in > now else "expired"
+
+
+def _page_query(
+    user_id: Optional[int],
+    client_id: Optional[str],
+    status: Optional[str],
+    after: Optional[Tuple[int, int]],
+    limit: int,
+    now: int,
+) -> Select:
+    stmt = select(
+        _tokens.c.id,
+        _tokens.c.client_id,
+        _tokens.c.user_id,
+        _tokens.c.scope,
+        _tokens.c.issued_at,
+        _tokens.c.expires_in,
+        _tokens.c.revoked,
+    )
+    if user_id is not None:
+        stmt = stmt.where(_tokens.c.user_id == user_id)
+    if client_id is not None:
+        stmt = stmt.where(_tokens.c.client_id == client_id)
+
+    expires_at = _tokens.c.issued_at + _tokens.c.expires_in
+    if status == "revoked":
+        stmt = stmt.where(_tokens.c.revoked.is_(True))
+    elif status == "active":
+        stmt = stmt.where(and_(_tokens.c.revoked.is_(False), expires_at > now))
+    elif status == "expired":
+        stmt = stmt.where(and_(_tokens.c.revoked.is_(False), expires_at <= now))
+
+    if after is not None:
+        stmt = stmt.where(tuple_(_tokens.c.issued_at, _tokens.c.id) < after)
+    return stmt.order_by(_tokens.c.issued_at.desc(), _tokens.c.id.desc()).limit(limit)
+
+
+async def list_tokens(
+    *,
+    user_id: Optional[int] = None,
+    client_id: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    after: Optional[Tuple[int, int]] = None,
+    now: Optional[int] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """One page of tokens plus the cursor of the next page, if there is one."""
+    now = now or int(time.time())
+    # One extra row tells whether another page follows
+    stmt = _page_query(user_id, client_id, status, after, limit + 1, now)
+    async with engine.connect() as conn:
+        rows = (await conn.execute(stmt)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].issued_at, rows[-1].id)
+    items = [
+        {
+            "id": row.id,
+            "client_id": row.client_id,
+            "user_id": row.user_id,
+            "scope": row.scope,
+            "issued_at": row.issued_at,
+            "expires_at": row.issued_at + row.expires_in,
+            "status": _status(row, now),
+        }
+        for row in rows
+    ]
+    return items, next_cursor
+
+
+async def iter_tokens(
+    *,
+    user_id: Optional[int] = None,
+    client_id: Optional[str] = None,
+    status: Optional[str] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[dict]:
+    """Every matching token, fetched page by page so no connection or
+    transaction stays open while the consumer is slow."""
+    now = int(time.time())
+    after = None
+    while True:
+        items, next_cursor = await list_tokens(
+            user_id=user_id,
+            client_id=client_id,
+            status=status,
+            limit=batch_size,
+            after=after,
+            now=now,
+        )
+        for item in items:
+            yield item
+        if next_cursor is None:
+            return
+        after = (items[-1]["issued_at"], items[-1]["id"])
@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite+aiosqlite:///{tempfile.gettempdir()}/oauth2_test_{os.getpid()}.db",
+)
+
+import pytest
+from src.clients import client_registry
+from src.database import Base, SessionLocal, engine
+from src.grants import reusable_tokens
+from src.models import Client
+
+
+def pytest_configure(config):
+    # Resolve --benchmark-storage against the rootdir rather than the working
+    # directory, so the stored baseline is found wherever pytest is run from.
+    # pytest-benchmark reads the option in its own (trylast) pytest_configure.
+    storage = config.getoption("benchmark_storage", None)
+    if storage and "://" not in storage and not os.path.isabs(storage):
+        config.option.benchmark_storage = str(config.rootpath / storage)
+
+
+@pytest.fixture
+async def db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as session:
+        session.add(
+            Client(
+                client_id="test_client",
+                client_secret="test_secret",
+                grant_types=(
+                    "authorization_code,client_credentials,refresh_token,"
+                    "urn:ietf:params:oauth:grant-type:device_code"
+                ),
+                response_types="code",
+                scope="read openid profile",
+                redirect_uris="http://test/callback",
+            )
+        )
+        await session.commit()
+    client_registry.invalidate()
+    reusable_tokens.discard("test_client")
+    yield
+    await engine.dispose()
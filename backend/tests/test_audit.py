@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+from src.audit import AuditLog, audit_log, list_segments, read_events
+from src.oauth import storage
+
+
+async def test_events_are_flushed_to_rotating_segments(tmp_path):
+    log = AuditLog(directory=str(tmp_path), segment_max_bytes=200)
+    await log.start()
+    for i in range(10):
+        log.emit("token_issued", token_id=i, client_id="c")
+        await log.flush()
+    log.emit("token_revoked", token_id=3, client_id="c")
+    await log.stop()
+
+    assert len(list_segments(str(tmp_path))) > 1
+    assert [r["token_id"] for r in read_events(str(tmp_path))] == [*range(10), 3]
+    revoked = list(read_events(str(tmp_path), event="token_revoked"))
+    assert [r["token_id"] for r in revoked] == [3]
+
+
+async def test_storage_emits_lifecycle_events(db):
+    audit_log._buffer.clear()
+    await storage.create_token(
+        request=None, client_id="test_client", scope="read", access_token="a"
+    )
+    await storage.revoke_token(request=None, access_token="a")
+
+    events = [(event, fields) for _, event, fields in audit_log._buffer]
+    assert [event for event, _ in events] == ["token_issued", "token_revoked"]
+    assert all("a" not in fields.values() for _, fields in events)
+
+
+async def test_stop_waits_for_the_write_in_flight(tmp_path, monkeypatch):
+    log = AuditLog(directory=str(tmp_path), flush_interval=0.01)
+    writing = 0
+    overlapped = False
+    write = log._write
+
+    def slow_write(batch):
+        nonlocal writing, overlapped
+        writing += 1
+        overlapped = overlapped or writing > 1
+        time.sleep(0.05)
+        write(batch)
+        writing -= 1
+
+    monkeypatch.setattr(log, "_write", slow_write)
+    await log.start()
+    log.emit("token_issued", token_id=1, client_id="c")
+    await asyncio.sleep(0.03)  # the loop is now inside slow_write
+    log.emit("token_issued", token_id=2, client_id="c")
+    await log.stop()
+
+    assert not overlapped
+    assert [r["token_id"] for r in read_events(str(tmp_path))] == [1, 2]
@@ -0,0 +1,230 @@
+"""Micro-benchmarks for the per-request hot paths.
+
+Benchmarks only run once each in the normal test run (--benchmark-disable in
+pyproject). To measure, and to fail on a regression against the stored
+baseline in tests/benchmarks:
+
+    pytest tests/test_benchmarks.py --benchmark-enable \\
+        --benchmark-compare --benchmark-compare-fail=min:100%
+
+The gate is on `min` over at least 50 rounds (pyproject), which moved by up
+to ~60% between runs of an unchanged tree on a shared single-core runner;
+`median` moved by up to ~100%. The 100% threshold therefore flags a doubling,
+not noise. The storage path resolves against the rootdir (conftest), so the
+command works from any directory. Refresh the baseline, e.g. after an
+intended change or on a new machine, with
+`--benchmark-enable --benchmark-save=baseline`.
+
+Storage runs against an in-memory SQLite so disk noise stays out of the
+numbers; the benchmarks are sync and drive their own event loop, since
+pytest-benchmark cannot time coroutines.
+"""
+
+import asyncio
+import secrets
+
+import pytest
+from aioauth.config import Settings
+from aioauth.requests import Post, Request
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from src import clients, oauth
+from src.auth.security import get_password_hash, verify_password
+from src.clients import client_registry
+from src.database import Base
+from src.grants import reusable_tokens
+from src.models import Client
+from src.oauth import server, storage
+from src.routes import _filter_dataclass_data
+
+settings = Settings(INSECURE_TRANSPORT=True)
+
+
+def bench_client() -> Client:
+    return Client(
+        client_id="test_client",
+        client_secret="test_secret",
+        grant_types="authorization_code,client_credentials",
+        response_types="code",
+        scope="read openid profile",
+        redirect_uris="http://test/callback",
+    )
+
+
+def token_request(**post) -> Request:
+    return Request(
+        method="POST",
+        post=Post(client_id="test_client", client_secret="test_secret", **post),
+        url="http://test/token",
+        settings=settings,
+    )
+
+
+def new_code(run) -> str:
+    code = secrets.token_urlsafe(32)
+    run(
+        storage.create_authorization_code(
+            request=None,
+            client_id="test_client",
+            scope="read",
+            response_type="code",
+            redirect_uri="http://test/callback",
+            code=code,
+        )
+    )
+    return code
+
+
+@pytest.fixture(scope="module")
+def run():
+    loop = asyncio.new_event_loop()
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine)() as session:
+            session.add(bench_client())
+            await session.commit()
+        client_registry.invalidate()
+        reusable_tokens.discard("test_client")
+        for name in ("bench", "revoke"):
+            await storage.create_token(
+                None,
+                client_id="test_client",
+                scope="read",
+                access_token=f"{name}-access",
+                refresh_token=f"{name}-refresh",
+            )
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(oauth, "engine", engine)
+        mp.setattr(
+            oauth, "SessionLocal", async_sessionmaker(engine, expire_on_commit=False)
+        )
+        mp.setattr(clients, "engine", engine)
+        loop.run_until_complete(setup())
+        yield loop.run_until_complete
+        client_registry.invalidate()
+        reusable_tokens.discard("test_client")
+        loop.run_until_complete(engine.dispose())
+    loop.close()
+
+
+@pytest.mark.benchmark(group="models")
+def test_to_aioauth_client(benchmark):
+    client = benchmark(bench_client().to_aioauth_client)
+    assert client.grant_types == ["authorization_code", "client_credentials"]
+
+
+@pytest.mark.benchmark(group="models")
+def test_filter_dataclass_data(benchmark):
+    data = {
+        "grant_type": "authorization_code",
+        "code": "abc",
+        "client_id": "test_client",
+        "redirect_uri": "http://test/callback",
+        "unrelated": "x",
+    }
+    filtered = benchmark(_filter_dataclass_data, Post, data)
+    assert "unrelated" not in filtered
+
+
+@pytest.mark.benchmark(group="hashing")
+def test_verify_password(benchmark):
+    hashed = get_password_hash("correct horse")
+    assert benchmark(verify_password, "correct horse", hashed)
+
+
+@pytest.mark.benchmark(group="storage")
+def test_get_client(benchmark, run):
+    client = benchmark(lambda: run(storage.get_client(None, client_id="test_client")))
+    assert client.client_id == "test_client"
+
+
+@pytest.mark.benchmark(group="storage")
+def test_get_client_miss(benchmark, run):
+    def miss():
+        client_registry.invalidate()
+        return run(storage.get_client(None, client_id="test_client"))
+
+    assert benchmark(miss).client_id == "test_client"
+
+
+@pytest.mark.benchmark(group="storage")
+def test_create_token(benchmark, run):
+    token = benchmark(
+        lambda: run(
+            storage.create_token(
+                None,
+                client_id="test_client",
+                scope="read",
+                access_token=secrets.token_urlsafe(32),
+            )
+        )
+    )
+    assert token.scope_mask
+
+
+@pytest.mark.benchmark(group="storage")
+def test_get_token(benchmark, run):
+    token = benchmark(lambda: run(storage.get_token(None, access_token="bench-access")))
+    assert token.client_id == "test_client"
+
+
+@pytest.mark.benchmark(group="storage")
+def test_revoke_token(benchmark, run):
+    benchmark(lambda: run(storage.revoke_token(None, refresh_token="revoke-refresh")))
+    assert run(storage.get_token(None, refresh_token="revoke-refresh")).revoked
+
+
+@pytest.mark.benchmark(group="storage")
+def test_create_authorization_code(benchmark, run):
+    code = benchmark(new_code, run)
+    assert run(storage.get_authorization_code(None, "test_client", code))
+
+
+@pytest.mark.benchmark(group="storage")
+def test_get_authorization_code(benchmark, run):
+    code = new_code(run)
+    found = benchmark(
+        lambda: run(storage.get_authorization_code(None, "test_client", code))
+    )
+    assert found.code == code
+
+
+@pytest.mark.benchmark(group="storage")
+def test_consume_authorization_code(benchmark, run):
+    # Every round needs a fresh code, created outside the timed call
+    consumed = benchmark.pedantic(
+        lambda code: run(storage.consume_authorization_code(None, "test_client", code)),
+        setup=lambda: ((new_code(run),), {}),
+        rounds=200,
+    )
+    assert consumed.client_id == "test_client"
+
+
+@pytest.mark.benchmark(group="token_endpoint")
+def test_create_token_response_client_credentials(benchmark, run):
+    request = token_request(grant_type="client_credentials", scope="read")
+    response = benchmark(lambda: run(server.create_token_response(request)))
+    assert response.status_code == 200
+
+
+@pytest.mark.benchmark(group="token_endpoint")
+def test_create_token_response_authorization_code(benchmark, run):
+    def prepared_request():
+        code = new_code(run)
+        request = token_request(
+            grant_type="authorization_code",
+            code=code,
+            redirect_uri="http://test/callback",
+        )
+        return (request,), {}
+
+    response = benchmark.pedantic(
+        lambda request: run(server.create_token_response(request)),
+        setup=prepared_request,
+        rounds=200,
+    )
+    assert response.status_code == 200
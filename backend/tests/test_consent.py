@@ -0,0 +1,82 @@
+import base64
+import json
+import urllib.parse
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from itsdangerous import TimestampSigner
+from src.consent import consent_store
+from src.database import SessionLocal
+from src.main import app
+from src.models import User
+
+
+@pytest.fixture
+async def user(db):
+    async with SessionLocal() as session:
+        user = User(username="alice", password_hash="x")
+        session.add(user)
+        await session.commit()
+    consent_store._granted.clear()
+    return user
+
+
+@pytest.fixture
+async def client(user):
+    payload = base64.b64encode(json.dumps({"user_id": user.id}).encode())
+    cookie = TimestampSigner("super_secret_key").sign(payload).decode()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(
+        transport=transport, base_url="http://test", cookies={"session": cookie}
+    ) as c:
+        yield c
+
+
+AUTHORIZE_URL = (
+    "/authorize?response_type=code&client_id=test_client"
+    "&redirect_uri=http://test/callback&scope=read&state=xyz"
+)
+
+
+async def test_authorize_asks_for_consent_first_time(client):
+    response = await client.get(AUTHORIZE_URL)
+    assert response.status_code == 307
+    assert response.headers["location"].startswith("http://localhost:5173/consent")
+
+
+async def test_authorize_skips_consent_when_already_granted(client, user):
+    await consent_store.grant(user.id, "test_client", "read")
+
+    response = await client.get(AUTHORIZE_URL)
+
+    location = urllib.parse.urlparse(response.headers["location"])
+    assert location.netloc == "test"
+    assert "code" in urllib.parse.parse_qs(location.query)
+
+
+async def test_revoked_consent_is_asked_again(client, user):
+    await consent_store.grant(user.id, "test_client", "read")
+    assert await consent_store.is_covered(user.id, "test_client", "read")
+    assert not await consent_store.is_covered(user.id, "test_client", "read write")
+
+    response = await client.delete("/consents/test_client")
+    assert response.status_code == 200
+    assert not await consent_store.is_covered(user.id, "test_client", "read")
+
+
+async def test_failed_authorization_records_no_consent(client, user):
+    response = await client.post(
+        "/authorize",
+        json={
+            "response_type": "code",
+            "client_id": "test_client",
+            "redirect_uri": "http://test/callback",
+            "scope": "admin",
+            "state": "xyz",
+        },
+    )
+
+    location = urllib.parse.urlparse(response.json()["redirect_to"])
+    assert "error" in urllib.parse.parse_qs(location.query)
+    assert not await consent_store.is_covered(user.id, "test_client", "admin")
+    assert await consent_store.list_grants(user.id) == []
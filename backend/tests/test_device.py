@@ -0,0 +1,123 @@
+import asyncio
+import base64
+import json
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from itsdangerous import TimestampSigner
+from aioauth.responses import Response
+from src.device import DEVICE_CODE_GRANT, device_authorizations
+from src.limiter import limiter_pools
+from src.main import app
+from src.oauth import storage
+
+
+@pytest.fixture
+async def client(db):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+
+
+async def start(client) -> dict:
+    response = await client.post(
+        "/device_authorization", data={"client_id": "test_client", "scope": "read"}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def poll(client, device_code: str):
+    return client.post(
+        "/token",
+        data={
+            "grant_type": DEVICE_CODE_GRANT,
+            "device_code": device_code,
+            "client_id": "test_client",
+            "client_secret": "test_secret",
+        },
+    )
+
+
+async def test_poll_is_released_when_user_approves(client):
+    started = await start(client)
+    pending_poll = asyncio.create_task(poll(client, started["device_code"]))
+    await asyncio.sleep(0.05)
+    assert not pending_poll.done()
+
+    assert device_authorizations.decide(started["user_code"], 42, approved=True)
+    response = await asyncio.wait_for(pending_poll, 1)
+
+    assert response.status_code == 200
+    token = await storage.get_token(
+        request=None, access_token=response.json()["access_token"]
+    )
+    assert token.user_id == 42
+    assert len(device_authorizations) == 0
+
+
+async def test_poll_times_out_as_pending_then_denied(client, monkeypatch):
+    monkeypatch.setattr("src.grants.LONG_POLL_TIMEOUT", 0.05)
+    started = await start(client)
+
+    response = await poll(client, started["device_code"])
+    assert response.json()["error"] == "authorization_pending"
+
+    device_authorizations.decide(started["user_code"].lower(), 42, approved=False)
+    response = await poll(client, started["device_code"])
+    assert response.json()["error"] == "access_denied"
+
+
+async def test_device_page_requires_an_explicit_decision(client):
+    started = await start(client)
+    authorization = device_authorizations.get_by_user_code(started["user_code"])
+    payload = base64.b64encode(json.dumps({"user_id": 42}).encode())
+    cookie = TimestampSigner("super_secret_key").sign(payload).decode()
+    client.cookies["session"] = cookie
+
+    response = await client.post("/device", data={"user_code": started["user_code"]})
+    assert response.status_code == 422
+    assert authorization.status == "pending"
+
+    response = await client.post(
+        "/device", data={"user_code": started["user_code"], "approve": "false"}
+    )
+    assert response.json() == {"approved": False}
+    assert authorization.status == "denied"
+
+
+async def test_device_long_poll_holds_no_heavy_slot(client):
+    heavy = limiter_pools["heavy"]
+    started = await start(client)
+    pending_poll = asyncio.create_task(poll(client, started["device_code"]))
+    await asyncio.sleep(0.05)
+
+    assert not pending_poll.done()
+    assert heavy.in_flight == 0
+
+    device_authorizations.decide(started["user_code"], 42, approved=False)
+    await asyncio.wait_for(pending_poll, 1)
+
+
+async def test_stray_device_code_does_not_skip_the_limiter(client, monkeypatch):
+    heavy = limiter_pools["heavy"]
+    seen = []
+
+    async def create_token_response(request):
+        seen.append(heavy.in_flight)
+        return Response(status_code=400, content={"error": "invalid_grant"})
+
+    monkeypatch.setattr(
+        "src.routes.server.create_token_response", create_token_response
+    )
+    await client.post(
+        "/token",
+        data={
+            "grant_type": "refresh_token",
+            "refresh_token": "x",
+            "device_code": "x",
+            "client_id": "test_client",
+            "client_secret": "test_secret",
+        },
+    )
+    assert seen == [1]
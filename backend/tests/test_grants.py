@@ -0,0 +1,86 @@
+import asyncio
+
+from aioauth.config import Settings
+from aioauth.requests import Post, Request
+from src.oauth import server, storage
+
+settings = Settings(INSECURE_TRANSPORT=True)
+
+
+def token_request(**post) -> Request:
+    return Request(
+        method="POST",
+        post=Post(client_id="test_client", client_secret="test_secret", **post),
+        url="http://test/token",
+        settings=settings,
+    )
+
+
+async def test_code_is_redeemed_exactly_once(db):
+    await storage.create_authorization_code(
+        request=None,
+        client_id="test_client",
+        scope="read",
+        response_type="code",
+        redirect_uri="http://test/callback",
+        code="race-code",
+    )
+
+    responses = await asyncio.gather(
+        *(
+            server.create_token_response(
+                token_request(
+                    grant_type="authorization_code",
+                    code="race-code",
+                    redirect_uri="http://test/callback",
+                )
+            )
+            for _ in range(100)
+        )
+    )
+
+    status_codes = [response.status_code for response in responses]
+    assert status_codes.count(200) == 1
+    assert status_codes.count(400) == 99
+
+
+async def test_refresh_token_is_redeemed_exactly_once(db):
+    await storage.create_token(
+        request=None,
+        client_id="test_client",
+        scope="read",
+        access_token="old-access",
+        refresh_token="race-refresh",
+    )
+
+    responses = await asyncio.gather(
+        *(
+            server.create_token_response(
+                token_request(grant_type="refresh_token", refresh_token="race-refresh")
+            )
+            for _ in range(20)
+        )
+    )
+
+    status_codes = [response.status_code for response in responses]
+    assert status_codes.count(200) == 1
+    assert status_codes.count(400) == 19
+
+
+async def test_client_credentials_reuses_token_within_window(db):
+    first = await server.create_token_response(
+        token_request(grant_type="client_credentials", scope="read")
+    )
+    second = await server.create_token_response(
+        token_request(grant_type="client_credentials", scope="read")
+    )
+
+    assert first.status_code == 200
+    assert "refresh_token" not in first.content
+    assert second.content["access_token"] == first.content["access_token"]
+
+    await storage.revoke_token(request=None, access_token=first.content["access_token"])
+    third = await server.create_token_response(
+        token_request(grant_type="client_credentials", scope="read")
+    )
+    assert third.content["access_token"] != first.content["access_token"]
@@ -0,0 +1,65 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool, StaticPool
+from src.audit import audit_log
+from src.clients import client_registry
+from src.database import engine as db_engine
+from src.health import readiness, warm_up
+from src.main import app
+from src.models import AuthorizationCode, Token
+
+
+async def test_readyz_reports_ready_only_after_warm_up(db):
+    readiness.ready = False
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        assert (await client.get("/healthz")).status_code == 200
+        assert (await client.get("/readyz")).status_code == 503
+
+        await warm_up()
+        assert "test_client" in client_registry._clients
+
+        response = await client.get("/readyz")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["status"] == "ready"
+        assert body["db_latency_ms"] > 0
+        assert set(body["limiters"]) == {"heavy", "light"}
+
+
+@pytest.mark.parametrize("poolclass", [StaticPool, NullPool])
+async def test_warm_up_handles_pools_without_a_size(db, monkeypatch, poolclass):
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=poolclass)
+    monkeypatch.setattr("src.health.engine", engine)
+    readiness.ready = False
+
+    await warm_up()
+    assert readiness.ready
+    await engine.dispose()
+
+
+async def test_warm_up_runs_the_write_paths_without_keeping_rows(db):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_engine.sync_engine, "before_cursor_execute", record)
+    audited = len(audit_log._buffer)
+    try:
+        await warm_up()
+    finally:
+        event.remove(db_engine.sync_engine, "before_cursor_execute", record)
+
+    assert any(s.startswith("INSERT INTO tokens") for s in statements)
+    assert any(s.startswith("INSERT INTO authorization_codes") for s in statements)
+    async with db_engine.connect() as conn:
+        for model in (Token, AuthorizationCode):
+            count = await conn.scalar(
+                select(func.count()).select_from(model).where(model.client_id.is_(None))
+            )
+            assert count == 0
+    assert len(audit_log._buffer) == audited
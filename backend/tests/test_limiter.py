@@ -0,0 +1,93 @@
+import asyncio
+
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from src.limiter import AdaptiveLimiter, ConcurrencyLimitMiddleware
+
+
+async def test_limit_grows_on_fast_requests_and_backs_off_on_slow():
+    limiter = AdaptiveLimiter("test", initial_limit=10, target_latency=0.1)
+
+    for _ in range(10):
+        assert await limiter.acquire(timeout=0)
+        limiter.release(latency=0.01)
+    assert limiter.limit > 10
+
+    assert await limiter.acquire(timeout=0)
+    limiter.release(latency=1.0)
+    assert limiter.limit < 10
+
+
+async def test_excess_requests_queue_then_shed():
+    limiter = AdaptiveLimiter("test", initial_limit=1, target_latency=1, max_queue=1)
+    assert await limiter.acquire(timeout=0)
+
+    queued = asyncio.create_task(limiter.acquire(timeout=1))
+    await asyncio.sleep(0)
+    assert not await limiter.acquire(timeout=1)  # queue full: shed at once
+
+    limiter.release()
+    assert await queued
+    assert limiter.in_flight == 1
+    assert not await limiter.acquire(timeout=0.01)  # deadline passes in queue
+    assert limiter.shed == 2
+
+
+async def test_slot_granted_as_the_deadline_passes_is_not_leaked(monkeypatch):
+    limiter = AdaptiveLimiter("test", initial_limit=1, target_latency=1)
+    assert await limiter.acquire(timeout=0)
+
+    async def grant_then_time_out(waiter, timeout):
+        limiter.release()  # hands the slot to the queued waiter
+        raise TimeoutError
+
+    monkeypatch.setattr(asyncio, "wait_for", grant_then_time_out)
+    assert await limiter.acquire(timeout=1)
+    assert limiter.in_flight == 1 and limiter.shed == 0
+
+    limiter.release()
+    assert limiter.in_flight == 0
+    assert await limiter.acquire(timeout=0)
+
+
+async def test_cancelled_waiter_returns_a_granted_slot():
+    limiter = AdaptiveLimiter("test", initial_limit=1, target_latency=1)
+    assert await limiter.acquire(timeout=0)
+
+    queued = asyncio.create_task(limiter.acquire(timeout=1))
+    await asyncio.sleep(0)
+    limiter.release()  # grant, then cancel before the waiter resumes
+    queued.cancel()
+    await asyncio.gather(queued, return_exceptions=True)
+
+    assert limiter.in_flight == 0
+    assert await limiter.acquire(timeout=0)
+
+
+async def test_middleware_returns_503_when_pool_is_saturated():
+    release = asyncio.Event()
+
+    async def slow(request):
+        await release.wait()
+        return PlainTextResponse("ok")
+
+    app = ConcurrencyLimitMiddleware(
+        Starlette(routes=[Route("/slow", slow)]),
+        pools={"p": AdaptiveLimiter("p", initial_limit=1, target_latency=1)},
+        routes={},
+        default_pool="p",
+        deadlines={"p": 0.05},
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        first = asyncio.create_task(client.get("/slow"))
+        await asyncio.sleep(0.01)
+        shed = await client.get("/slow")
+        release.set()
+
+        assert shed.status_code == 503
+        assert shed.headers["retry-after"] == "1"
+        assert (await first).status_code == 200
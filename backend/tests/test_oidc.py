@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from aioauth.config import Settings
+from aioauth.requests import Post, Request
+from httpx import ASGITransport, AsyncClient
+from src.database import SessionLocal
+from src.main import app
+from src.models import User
+from src.oauth import server, storage
+from src.oidc import jwks, userinfo_cache
+
+
+@pytest.fixture
+async def user(db):
+    async with SessionLocal() as session:
+        user = User(username="alice", password_hash="x")
+        session.add(user)
+        await session.commit()
+    userinfo_cache.clear()
+    return user
+
+
+async def exchange_code(user, scope: str) -> dict:
+    await storage.create_authorization_code(
+        request=SimpleNamespace(user=user),
+        client_id="test_client",
+        scope=scope,
+        response_type="code",
+        redirect_uri="http://test/callback",
+        code="oidc-code",
+        nonce="nonce-1",
+    )
+    response = await server.create_token_response(
+        Request(
+            method="POST",
+            post=Post(
+                grant_type="authorization_code",
+                code="oidc-code",
+                redirect_uri="http://test/callback",
+                client_id="test_client",
+                client_secret="test_secret",
+            ),
+            url="http://test/token",
+            settings=Settings(INSECURE_TRANSPORT=True),
+        )
+    )
+    assert response.status_code == 200
+    return response.content
+
+
+async def test_openid_scope_returns_signed_id_token(user):
+    content = await exchange_code(user, "openid profile")
+
+    public_key = jwt.PyJWK(jwks()["keys"][0]).key
+    claims = jwt.decode(
+        content["id_token"], public_key, algorithms=["RS256"], audience="test_client"
+    )
+    assert claims["sub"] == str(user.id)
+    assert claims["nonce"] == "nonce-1"
+    assert claims["preferred_username"] == "alice"
+
+
+async def test_plain_oauth_exchange_has_no_id_token(user):
+    content = await exchange_code(user, "read")
+    assert "id_token" not in content
+
+
+async def test_userinfo_is_refreshed_after_profile_change(user):
+    content = await exchange_code(user, "openid profile")
+    headers = {"Authorization": f"Bearer {content['access_token']}"}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.get("/userinfo", headers=headers)
+        assert response.json()["preferred_username"] == "alice"
+
+        async with SessionLocal() as session:
+            db_user = await session.get(User, user.id)
+            db_user.username = "alice2"
+            await session.commit()
+
+        response = await client.get("/userinfo", headers=headers)
+        assert response.json()["preferred_username"] == "alice2"
+
+
+async def test_userinfo_works_with_refreshed_token(user):
+    content = await exchange_code(user, "openid profile")
+    response = await server.create_token_response(
+        Request(
+            method="POST",
+            post=Post(
+                grant_type="refresh_token",
+                refresh_token=content["refresh_token"],
+                client_id="test_client",
+                client_secret="test_secret",
+            ),
+            url="http://test/token",
+            settings=Settings(INSECURE_TRANSPORT=True),
+        )
+    )
+    assert response.status_code == 200
+    headers = {"Authorization": f"Bearer {response.content['access_token']}"}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.get("/userinfo", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["sub"] == str(user.id)
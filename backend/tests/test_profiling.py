@@ -0,0 +1,88 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from src.auth.admin import sign_admin_token, verify_admin_token
+from src.profiling import (
+    Profile,
+    ProfileStore,
+    ProfilingMiddleware,
+    StackSampler,
+    stage,
+)
+
+
+def busy_hash():
+    time.sleep(0.05)
+
+
+async def slow(request):
+    with stage("hashing"):
+        busy_hash()
+    return PlainTextResponse("ok")
+
+
+async def test_sampled_request_is_stored_as_collapsed_stacks(tmp_path):
+    store = ProfileStore(str(tmp_path), slots=2)
+    app = ProfilingMiddleware(
+        Starlette(routes=[Route("/slow", slow)]),
+        store=store,
+        sampler=StackSampler(interval=0.001),
+        sample_rate=1.0,
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        ids = [(await client.get("/slow")).headers["x-profile-id"] for _ in range(3)]
+
+    assert ids == ["1", "2", "3"]
+    profile = store.get(3)
+    assert profile["path"] == "/slow"
+    assert profile["stages"]["hashing"] >= 0.05
+    assert "hashing;" in profile["collapsed"]
+    assert "busy_hash" in profile["collapsed"]
+
+    # Two slots: profile 1 was overwritten by profile 3
+    assert store.get(1) is None
+    assert [p["id"] for p in store.list()] == [3, 2]
+
+
+def test_admin_token_signature_and_age():
+    token = sign_admin_token("secret")
+    assert verify_admin_token(token, "secret")
+    assert not verify_admin_token(token, "other")
+    assert not verify_admin_token(sign_admin_token("secret", timestamp=1), "secret")
+    assert not verify_admin_token(None, "secret")
+
+
+async def test_profile_ids_continue_after_a_restart(tmp_path):
+    first = ProfileStore(str(tmp_path), slots=4)
+    ids = await asyncio.gather(*(first.next_id() for _ in range(3)))
+    assert sorted(ids) == [1, 2, 3]
+    first.save(Profile(3, "GET", "/", None))
+
+    assert await ProfileStore(str(tmp_path), slots=4).next_id() == 4
+
+
+def test_admin_secret_alone_does_not_enable_profiling():
+    def enabled(**env) -> str:
+        return subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import src.profiling as p; print(p.PROFILING_ENABLED)",
+            ],
+            env={**os.environ, "PROFILING_ENABLED": "", **env},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+
+    assert enabled(ADMIN_SECRET="secret") == "False"
+    assert enabled(ADMIN_SECRET="secret", PROFILING_ENABLED="1") == "True"
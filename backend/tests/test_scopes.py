@@ -0,0 +1,51 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from src.main import app
+from src.oauth import storage
+from src.scopes import ScopeRegistry
+
+
+def test_registry_masks_are_stable_and_ignore_unknown_names():
+    registry = ScopeRegistry("read", "write")
+
+    assert registry.mask("read") == 0b01
+    assert registry.mask("write read unknown") == 0b11
+    assert registry.mask("") == 0
+    with pytest.raises(ValueError):
+        registry.require("admin")
+
+
+def test_registering_a_scope_invalidates_cached_masks():
+    registry = ScopeRegistry("read")
+    assert registry.mask("read admin") == 0b01
+
+    registry.register("admin")
+    assert registry.mask("read admin") == 0b11
+
+
+@pytest.fixture
+async def client(db):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+
+
+async def test_protected_requires_read_scope(client):
+    for access_token, scope in (("with-read", "read"), ("without-read", "email")):
+        await storage.create_token(
+            request=None,
+            client_id="test_client",
+            scope=scope,
+            access_token=access_token,
+        )
+
+    response = await client.get(
+        "/protected", headers={"Authorization": "Bearer with-read"}
+    )
+    assert response.status_code == 200
+
+    response = await client.get(
+        "/protected", headers={"Authorization": "Bearer without-read"}
+    )
+    assert response.status_code == 403
+    assert "insufficient_scope" in response.headers["www-authenticate"]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from src.oauth import storage
+from src.singleflight import SingleFlight
+
+
+async def test_concurrent_callers_share_one_call():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def lookup():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    results = await asyncio.gather(*(flight.do("k", lookup) for _ in range(50)))
+    assert calls == 1
+    assert all(r is results[0] for r in results)
+    assert flight.snapshot()["coalesced"] == 49
+
+    # Nothing is cached once the call has finished
+    await flight.do("k", lookup)
+    assert calls == 2
+
+
+async def test_failure_reaches_every_waiter_and_cancellation_does_not():
+    flight = SingleFlight("test")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("db down")
+
+    results = await asyncio.gather(
+        *(flight.do("k", failing) for _ in range(5)), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    leader = asyncio.create_task(flight.do("k", slow))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("k", slow))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == "ok"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+async def test_parallel_get_token_runs_one_query(db):
+    await storage.create_token(
+        request=None, client_id="test_client", scope="read", access_token="hot"
+    )
+    before = storage.token_lookups.executed
+
+    tokens = await asyncio.gather(
+        *(storage.get_token(request=None, access_token="hot") for _ in range(20))
+    )
+    assert all(t.access_token == "hot" for t in tokens)
+    assert storage.token_lookups.executed == before + 1
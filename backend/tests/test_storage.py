@@ -0,0 +1,135 @@
+from aioauth.config import Settings
+from aioauth.requests import Post, Request
+from sqlalchemy import select, update
+from src.clients import ClientRegistry
+from src.database import SessionLocal, engine
+from src.models import AuthorizationCode, Client, Token
+from src.oauth import server, storage
+
+
+async def test_tokens_are_stored_as_digests(db):
+    await storage.create_token(
+        request=None,
+        client_id="test_client",
+        scope="read",
+        access_token="access-123",
+        refresh_token="refresh-456",
+    )
+
+    async with SessionLocal() as session:
+        row = (await session.execute(select(Token))).scalar_one()
+    assert len(row.access_token_hash) == 32
+    assert b"access-123" not in row.access_token_hash
+
+    token = await storage.get_token(request=None, access_token="access-123")
+    assert token.access_token == "access-123"
+    assert await storage.get_token(request=None, access_token="wrong") is None
+
+    await storage.revoke_token(request=None, refresh_token="refresh-456")
+    token = await storage.get_token(request=None, refresh_token="refresh-456")
+    assert token.revoked
+
+
+async def test_authorization_code_lookup_by_digest(db):
+    await storage.create_authorization_code(
+        request=None,
+        client_id="test_client",
+        scope="read",
+        response_type="code",
+        redirect_uri="http://test/callback",
+        code="code-789",
+    )
+
+    code = await storage.get_authorization_code(
+        request=None, client_id="test_client", code="code-789"
+    )
+    assert code.code == "code-789"
+
+    await storage.delete_authorization_code(
+        request=None, client_id="test_client", code="code-789"
+    )
+    async with SessionLocal() as session:
+        assert (await session.execute(select(AuthorizationCode))).first() is None
+
+
+async def test_token_lookup_shapes_filter_by_client(db):
+    created = await storage.create_token(
+        request=None,
+        client_id="test_client",
+        scope="read",
+        access_token="access-1",
+        refresh_token="refresh-1",
+    )
+    assert created.scope_mask and not created.revoked
+
+    token = await storage.get_token(
+        request=None, refresh_token="refresh-1", client_id="test_client"
+    )
+    assert token.access_token == "" and token.refresh_token == "refresh-1"
+    assert token.scope_mask == created.scope_mask
+    assert (
+        await storage.get_token(
+            request=None, refresh_token="refresh-1", client_id="other_client"
+        )
+        is None
+    )
+
+    await storage.revoke_token(request=None, access_token="access-1")
+    assert (await storage.get_token(request=None, access_token="access-1")).revoked
+
+
+async def test_client_secret_mismatch_is_not_an_error(db):
+    async with SessionLocal() as session:
+        session.add(Client(client_id="public_client", scope="read"))
+        await session.commit()
+
+    assert await storage.get_client(None, "test_client", "test_secret")
+    assert await storage.get_client(None, "test_client", "sécret") is None
+    assert await storage.get_client(None, "public_client", "anything") is None
+
+
+async def test_non_ascii_secret_is_invalid_client(db):
+    response = await server.create_token_response(
+        Request(
+            method="POST",
+            post=Post(
+                grant_type="client_credentials",
+                client_id="test_client",
+                client_secret="tést_secret",
+            ),
+            url="http://test/token",
+            settings=Settings(INSECURE_TRANSPORT=True),
+        )
+    )
+    assert response.status_code == 401
+    assert response.content["error"] == "invalid_client"
+
+
+async def test_client_changes_reach_the_registry(db):
+    assert await storage.get_client(None, "test_client", "test_secret")
+
+    async with SessionLocal() as session:
+        client = await session.get(Client, "test_client")
+        client.client_secret = "rotated"
+        await session.commit()
+    assert await storage.get_client(None, "test_client", "test_secret") is None
+    assert await storage.get_client(None, "test_client", "rotated")
+
+    async with SessionLocal() as session:
+        await session.delete(await session.get(Client, "test_client"))
+        await session.commit()
+    assert await storage.get_client(None, "test_client") is None
+
+
+async def test_registry_rereads_clients_changed_elsewhere_after_ttl(db):
+    registry = ClientRegistry(ttl=0)
+    assert (await registry.get("test_client")).client_secret == "test_secret"
+
+    # A write that bypasses the ORM events, as another process would make
+    async with engine.begin() as conn:
+        await conn.execute(
+            update(Client.__table__)
+            .where(Client.__table__.c.client_id == "test_client")
+            .values(client_secret="rotated")
+        )
+    assert (await registry.get("test_client")).client_secret == "rotated"
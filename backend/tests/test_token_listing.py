@@ -0,0 +1,89 @@
+import json
+
+from httpx import ASGITransport, AsyncClient
+from src.auth import admin
+from src.auth.security import hash_token
+from src.database import engine
+from src.main import app
+from src.models import Token
+from src.token_listing import decode_cursor, iter_tokens, list_tokens
+
+NOW = 1_800_000_000
+
+
+async def _seed_tokens():
+    rows = [
+        {
+            "access_token_hash": hash_token(f"access-{i}"),
+            "scope": "read",
+            "issued_at": NOW - 100 * (i // 2),  # pairs share issued_at
+            "expires_in": 300,
+            "client_id": "test_client",
+            "user_id": 1 if i % 3 else 2,
+            "revoked": i == 4,
+        }
+        for i in range(12)
+    ]
+    async with engine.begin() as conn:
+        await conn.execute(Token.__table__.insert(), rows)
+
+
+async def test_keyset_pages_cover_every_row_once(db):
+    await _seed_tokens()
+
+    seen, after = [], None
+    while True:
+        items, cursor = await list_tokens(
+            client_id="test_client", limit=5, after=after, now=NOW
+        )
+        seen += items
+        if cursor is None:
+            break
+        after = decode_cursor(cursor)
+
+    assert len(seen) == 12 and len({t["id"] for t in seen}) == 12
+    keys = [(t["issued_at"], t["id"]) for t in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+async def test_status_filters(db):
+    await _seed_tokens()
+
+    active, _ = await list_tokens(client_id="test_client", status="active", now=NOW)
+    revoked, _ = await list_tokens(client_id="test_client", status="revoked", now=NOW)
+    expired, _ = await list_tokens(client_id="test_client", status="expired", now=NOW)
+
+    assert {t["issued_at"] for t in active} == {NOW, NOW - 100, NOW - 200}
+    assert [t["status"] for t in revoked] == ["revoked"]
+    assert len(active) + len(revoked) + len(expired) == 12
+    assert all(t["user_id"] == 2 for t in (await list_tokens(user_id=2))[0])
+
+    exported = [t async for t in iter_tokens(user_id=1, batch_size=3)]
+    assert len(exported) == 8
+
+
+async def test_admin_endpoints_require_token_and_stream_ndjson(db, monkeypatch):
+    await _seed_tokens()
+    monkeypatch.setattr(admin, "ADMIN_SECRET", "secret")
+    headers = {"X-Admin-Token": admin.sign_admin_token()}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        assert (await client.get("/admin/tokens?user_id=1")).status_code == 403
+        response = await client.get("/admin/tokens", headers=headers)
+        assert response.status_code == 400
+
+        response = await client.get(
+            "/admin/tokens?client_id=test_client&limit=10", headers=headers
+        )
+        assert len(response.json()["items"]) == 10
+        assert response.json()["next_cursor"]
+
+        response = await client.get(
+            "/admin/tokens/export?client_id=test_client", headers=headers
+        )
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = response.text.splitlines()
+        assert len(lines) == 12
+        assert "access_token_hash" not in json.loads(lines[0])
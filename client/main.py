@@ -1,17 +1,27 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
-import httpx
+from oauth_client import OAuth2Client, OAuthError
 import uvicorn
 import urllib.parse
 import json
 
-app = FastAPI()
-
 CLIENT_ID = "demo_client"
 CLIENT_SECRET = "demo_secret"
 PROVIDER_URL = "http://localhost:8000"
 REDIRECT_URI = "http://localhost:3000/callback"
 
+oauth = OAuth2Client(PROVIDER_URL, CLIENT_ID, CLIENT_SECRET)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await oauth.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
 CSS = """
 <style>
     body { font-family: 'Inter', system-ui, -apple-system, sans-serif; background: #f3f4f6; color: #1f2937; margin: 0; min-height: 100vh; display: flex; align-items: center; justify-content: center; }
@@ -58,29 +68,20 @@ async def callback(request: Request):
     if not code:
         return "Error: No code returned"
         
-    async with httpx.AsyncClient() as client:
-        # Exchange code for token
-        data = {
-            "grant_type": "authorization_code",
-            "code": code,
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET,
-            "redirect_uri": REDIRECT_URI
-        }
-        token_res = await client.post(f"{PROVIDER_URL}/token", data=data)
-        token_data = token_res.json()
-        
-        access_token = token_data.get("access_token")
-        
-        protected_data = None
-        if access_token:
-            # Access protected resource
-            protected_res = await client.get(f"{PROVIDER_URL}/protected", headers={"Authorization": f"Bearer {access_token}"})
-            if protected_res.status_code == 200:
-                protected_data = protected_res.json()
-            else:
-                protected_data = {"error": f"Failed to fetch: {protected_res.status_code}"}
-                
+    protected_data = None
+    try:
+        token_set = await oauth.exchange_code(code, REDIRECT_URI)
+        token_data = token_set.raw
+    except OAuthError as e:
+        token_data = e.payload
+    else:
+        # Access protected resource over the shared connection pool
+        protected_res = await oauth.get("/protected", token_set)
+        if protected_res.status_code == 200:
+            protected_data = protected_res.json()
+        else:
+            protected_data = {"error": f"Failed to fetch: {protected_res.status_code}"}
+
     return f"""
     <html>
         <head><title>Success</title>{CSS}</head>
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import httpx
+
+
+class OAuthError(Exception):
+    def __init__(self, status_code: int, payload: Any):
+        super().__init__(f"Token endpoint returned {status_code}: {payload}")
+        self.status_code = status_code
+        self.payload = payload
+
+
+@dataclass
+class TokenSet:
+    access_token: str
+    expires_at: float
+    scope: str = ""
+    refresh_token: Optional[str] = None
+    token_type: str = "Bearer"
+    raw: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_response(cls, data: Dict[str, Any]) -> "TokenSet":
+        return cls(
+            access_token=data["access_token"],
+            expires_at=time.monotonic() + data.get("expires_in", 0),
+            scope=data.get("scope") or "",
+            refresh_token=data.get("refresh_token"),
+            token_type=data.get("token_type", "Bearer"),
+            raw=data,
+        )
+
+    def expires_within(self, seconds: float) -> bool:
+        return time.monotonic() >= self.expires_at - seconds
+
+
+class OAuth2Client:
+    """Async client for the OAuth2 provider.
+
+    One instance should be shared per process: it keeps a single pooled
+    `httpx.AsyncClient`, caches client_credentials tokens per scope until
+    `refresh_margin` seconds before expiry, and lets concurrent callers that
+    need the same token (or the same refresh) share one `/token` request.
+    """
+
+    def __init__(
+        self,
+        provider_url: str,
+        client_id: str,
+        client_secret: str,
+        *,
+        refresh_margin: float = 30,
+        timeout: float = 10,
+        limits: Optional[httpx.Limits] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        if limits is None:
+            limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        self._http = httpx.AsyncClient(
+            base_url=provider_url, timeout=timeout, limits=limits, transport=transport
+        )
+        self._tokens: Dict[str, TokenSet] = {}
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    async def __aenter__(self) -> "OAuth2Client":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def _single_flight(
+        self, key: Hashable, fetch: Callable[[], Awaitable[TokenSet]]
+    ) -> TokenSet:
+        # The fetch runs as its own task, so a cancelled caller does not
+        # cancel it for the others waiting on the same key
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            # Mark retrieved so an unobserved failure does not log a warning
+            task.exception()
+
+    async def _token_request(self, data: Dict[str, str]) -> TokenSet:
+        response = await self._http.post(
+            "/token",
+            data={
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                **data,
+            },
+        )
+        if response.status_code != 200:
+            # Proxies and load shedders answer with HTML or plain text
+            try:
+                payload = response.json()
+            except ValueError:
+                payload = response.text
+            raise OAuthError(response.status_code, payload)
+        return TokenSet.from_response(response.json())
+
+    async def exchange_code(
+        self, code: str, redirect_uri: str, code_verifier: Optional[str] = None
+    ) -> TokenSet:
+        data = {
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": redirect_uri,
+        }
+        if code_verifier:
+            data["code_verifier"] = code_verifier
+        return await self._token_request(data)
+
+    async def refresh(self, token_set: TokenSet) -> TokenSet:
+        if not token_set.refresh_token:
+            raise ValueError("Token set has no refresh token")
+        refresh_token = token_set.refresh_token
+        return await self._single_flight(
+            ("refresh", refresh_token),
+            lambda: self._token_request(
+                {"grant_type": "refresh_token", "refresh_token": refresh_token}
+            ),
+        )
+
+    async def client_credentials(self, scope: str = "") -> TokenSet:
+        """Returns a cached token for `scope`, fetching a new one when it is
+        missing or about to expire."""
+        key = " ".join(sorted(set(scope.split())))
+        token_set = self._tokens.get(key)
+        if token_set and not token_set.expires_within(self.refresh_margin):
+            return token_set
+
+        async def fetch() -> TokenSet:
+            token_set = await self._token_request(
+                {"grant_type": "client_credentials", "scope": key}
+            )
+            self._tokens[key] = token_set
+            return token_set
+
+        return await self._single_flight(("client_credentials", key), fetch)
+
+    async def request(
+        self, method: str, path: str, token_set: TokenSet, **kwargs
+    ) -> httpx.Response:
+        headers = {
+            **kwargs.pop("headers", {}),
+            "Authorization": f"Bearer {token_set.access_token}",
+        }
+        return await self._http.request(method, path, headers=headers, **kwargs)
+
+    async def get(self, path: str, token_set: TokenSet, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, token_set, **kwargs)
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import urllib.parse
+
+import httpx
+import pytest
+from oauth_client import OAuth2Client, OAuthError, TokenSet
+
+
+class Provider:
+    """Fake /token endpoint that counts requests and can hold them open."""
+
+    def __init__(self, expires_in: int = 300):
+        self.expires_in = expires_in
+        self.requests = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path != "/token":
+            return httpx.Response(200, json=dict(request.headers))
+        form = dict(urllib.parse.parse_qsl(request.content.decode()))
+        self.requests.append(form)
+        await self.gate.wait()
+        if form.get("scope") == "overload":
+            return httpx.Response(503, text="<html>Service Unavailable</html>")
+        if form.get("refresh_token") == "bad":
+            return httpx.Response(400, json={"error": "invalid_grant"})
+        return httpx.Response(
+            200,
+            json={
+                "access_token": f"access-{len(self.requests)}",
+                "refresh_token": f"refresh-{len(self.requests)}",
+                "expires_in": self.expires_in,
+                "scope": form.get("scope", ""),
+                "token_type": "Bearer",
+            },
+        )
+
+
+@pytest.fixture
+def provider():
+    return Provider()
+
+
+@pytest.fixture
+async def client(provider):
+    async with OAuth2Client(
+        "http://provider",
+        "demo_client",
+        "demo_secret",
+        transport=httpx.MockTransport(provider),
+    ) as c:
+        yield c
+
+
+async def test_client_credentials_token_is_cached_per_scope(client, provider):
+    first = await client.client_credentials("read write")
+    assert await client.client_credentials("write read") is first
+    assert len(provider.requests) == 1
+    assert provider.requests[0]["scope"] == "read write"
+
+    await client.client_credentials("read")
+    assert len(provider.requests) == 2
+
+
+async def test_token_is_refetched_inside_the_refresh_margin(provider):
+    provider.expires_in = 10
+    async with OAuth2Client(
+        "http://provider",
+        "demo_client",
+        "demo_secret",
+        refresh_margin=30,
+        transport=httpx.MockTransport(provider),
+    ) as client:
+        first = await client.client_credentials("read")
+        second = await client.client_credentials("read")
+    assert first.access_token != second.access_token
+    assert len(provider.requests) == 2
+
+
+async def test_concurrent_callers_share_one_token_request(client, provider):
+    provider.gate.clear()
+    callers = [
+        asyncio.create_task(client.client_credentials("read")) for _ in range(10)
+    ]
+    await asyncio.sleep(0.01)
+    provider.gate.set()
+
+    tokens = await asyncio.gather(*callers)
+    assert len(provider.requests) == 1
+    assert {token.access_token for token in tokens} == {"access-1"}
+
+
+async def test_cancelled_caller_does_not_cancel_the_others(client, provider):
+    provider.gate.clear()
+    leader = asyncio.create_task(client.client_credentials("read"))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(client.client_credentials("read"))
+    await asyncio.sleep(0.01)
+
+    leader.cancel()
+    await asyncio.gather(leader, return_exceptions=True)
+    provider.gate.set()
+
+    assert (await follower).access_token == "access-1"
+    assert len(provider.requests) == 1
+
+
+async def test_refresh_failure_reaches_every_caller(client, provider):
+    provider.gate.clear()
+    token_set = TokenSet(access_token="old", expires_at=0, refresh_token="bad")
+    callers = [asyncio.create_task(client.refresh(token_set)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    provider.gate.set()
+
+    results = await asyncio.gather(*callers, return_exceptions=True)
+    assert all(isinstance(r, OAuthError) and r.status_code == 400 for r in results)
+    assert len(provider.requests) == 1
+
+
+async def test_request_sends_the_bearer_token(client):
+    token_set = await client.client_credentials("read")
+    response = await client.get("/api/me", token_set)
+    assert json.loads(response.content)["authorization"] == "Bearer access-1"
+
+
+async def test_non_json_error_body_raises_oauth_error(client):
+    with pytest.raises(OAuthError) as exc_info:
+        await client.client_credentials("overload")
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.payload == "<html>Service Unavailable</html>"